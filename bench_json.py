@@ -0,0 +1,53 @@
+import glob
+import os
+import sys
+import time
+
+import json_codec
+
+# Constants
+PAYLOAD_DIR = 'payloads'  # where the engine saves responses with "record_payloads": "payloads"
+MIN_BENCH_TIME = 0.5  # in seconds, per backend and payload
+
+# Micro-benchmark of the JSON backends over recorded API payloads.
+# Usage: python bench_json.py [payload files or directories ...]
+
+
+def collect_payloads(paths):
+    files = []
+    for path in paths:
+        files.extend(sorted(glob.glob(os.path.join(path, '*.json'))) if os.path.isdir(path) else [path])
+    return files
+
+
+def time_loads(loads, body):
+    # Repeat until MIN_BENCH_TIME has passed, returns the best time of one decode
+    best = float('inf')
+    deadline = time.perf_counter() + MIN_BENCH_TIME
+    while time.perf_counter() < deadline:
+        start = time.perf_counter()
+        loads(body)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+files = collect_payloads(sys.argv[1:] or [PAYLOAD_DIR])
+if not files:
+    print(f"No payloads found. Run the bot with \"record_payloads\": \"{PAYLOAD_DIR}\" first, or pass payload files.")
+    exit(1)
+
+backends = json_codec.available_backends()
+print(f"Backends: {', '.join(backends)}")
+print(f"{'payload':<48} {'size':>10} " + " ".join(f"{name:>10}" for name in backends))
+totals = dict.fromkeys(backends, 0.0)
+for path in files:
+    with open(path, 'rb') as file:
+        body = file.read()
+    timings = []
+    for name in backends:
+        loads, _ = json_codec.BACKENDS[name]()
+        elapsed = time_loads(loads, body)
+        totals[name] += elapsed
+        timings.append(elapsed)
+    print(f"{os.path.basename(path):<48} {len(body) / 1024:>8.0f}KB " + " ".join(f"{elapsed * 1000:>8.2f}ms" for elapsed in timings))
+print(f"{'total':<48} {'':>10} " + " ".join(f"{totals[name] * 1000:>8.2f}ms" for name in backends))
@@ -0,0 +1,42 @@
+import argparse
+import json
+import socket
+import sys
+
+# Constants
+CONTROL_SOCKET = 'bot_control.sock'  # control_socket of bot_daemon.py's profiles.json
+
+
+def send_command(path, request):
+    """Send one request to a running bot's control socket and return its response."""
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as client:
+        client.connect(path)
+        client.sendall(json.dumps(request).encode() + b"\n")
+        with client.makefile('rb') as reader:
+            return json.loads(reader.readline())
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Inspect or reconfigure a running bot. Changes apply at its next cycle.")
+    parser.add_argument('--socket', default=CONTROL_SOCKET, help="control socket path (default: %(default)s)")
+    subcommands = parser.add_subparsers(dest='command', required=True)
+    subcommands.add_parser('status', help="slot counts, spend and search interval")
+    subcommands.add_parser('reload', help="re-read the config file the bot was started with")
+    set_parser = subcommands.add_parser('set', help="merge a partial JSON config, e.g. '{\"profiles\": {\"main\": {\"max_orders\": 4}}}'")
+    set_parser.add_argument('config', help="JSON object of settings and profiles to change, merged key by key; a key set to null is removed")
+    args = parser.parse_args()
+
+    request = {"command": args.command}
+    if args.command == 'set':
+        request["config"] = json.loads(args.config)
+    try:
+        response = send_command(args.socket, request)
+    except OSError as e:
+        print(f"Cannot reach the bot on {args.socket}: {e}", file=sys.stderr)
+        sys.exit(1)
+    print(json.dumps(response, indent=2))
+    sys.exit(0 if response.get("ok") else 1)
+
+
+if __name__ == '__main__':
+    main()
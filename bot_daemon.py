@@ -0,0 +1,41 @@
+import asyncio
+import logging
+
+from engine import Engine
+from profiles import normalize_config, read_config
+
+# Constants
+API_KEY_FILE = 'api_key.txt'
+PROFILES_FILE = 'profiles.json'  # settings plus the named profiles to run, see profiles.py for defaults; watched for changes
+
+# Logging Configuration
+logging.basicConfig(level=logging.INFO,
+                    format='%(asctime)s - %(levelname)s - %(message)s',
+                    handlers=[logging.FileHandler("script_output_daemon.log"),
+                              logging.StreamHandler()])
+
+# Load API Key
+try:
+    with open(API_KEY_FILE, 'r') as file:
+        api_key = file.read().strip()
+except FileNotFoundError:
+    logging.error(f"API key file '{API_KEY_FILE}' not found.")
+    exit(1)
+except Exception as e:
+    logging.error(f"Error reading API key: {e}")
+    exit(1)
+
+# Load Profiles
+try:
+    config = read_config(PROFILES_FILE)
+    normalize_config(config)  # fail early on an invalid file
+except FileNotFoundError:
+    logging.error(f"Profiles file '{PROFILES_FILE}' not found.")
+    exit(1)
+except Exception as e:
+    logging.error(f"Error reading profiles: {e}")
+    exit(1)
+logging.info(f"Loaded profiles: {', '.join(config['profiles'])}")
+
+# Main Loop
+asyncio.run(Engine(api_key, config, PROFILES_FILE).run())
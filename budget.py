@@ -0,0 +1,60 @@
+import heapq
+
+# Constants
+BUDGET_RESOLUTION = 0.005  # in $/h, cost step of the knapsack table
+BUDGET_MAX_CANDIDATES = 30  # offers with the best throughput per dollar that the knapsack considers
+BUDGET_MAX_CELLS = 100_000  # knapsack table updates per call, larger budgets use a coarser resolution
+DEFAULT_THROUGHPUT_WEIGHT = 1.0  # per GPU, for models missing from the weights table
+
+
+def offer_throughput(offer, weights):
+    return weights.get(offer.get('gpu_name'), DEFAULT_THROUGHPUT_WEIGHT) * offer.get('num_gpus', 1)
+
+
+def select_within_budget(offers, budget, weights, max_count, resolution=BUDGET_RESOLUTION):
+    """Subset of `offers` with the highest total weighted throughput that fits the budget.
+
+    The dph_total of the chosen offers sums to at most `budget` ($/h still unspent)
+    and at most `max_count` offers are chosen. Solved as a 0/1 knapsack over cost in
+    `resolution` steps, with costs rounded up so the budget is never exceeded. The
+    resolution is coarsened so the table stays within BUDGET_MAX_CELLS, since this
+    runs on the event loop.
+    Returns the chosen offers, best throughput per dollar first.
+    """
+    if budget <= 0 or max_count <= 0:
+        return []
+    candidates = heapq.nlargest(BUDGET_MAX_CANDIDATES, offers,
+                                key=lambda offer: offer_throughput(offer, weights) / max(offer['dph_total'], resolution))
+    max_count = min(max_count, len(candidates))
+    resolution = max(resolution, budget * len(candidates) * max_count / BUDGET_MAX_CELLS)
+    steps = int(budget / resolution + 1e-9)
+    if steps <= 0 or not candidates:
+        return []
+    costs = [max(-int(-offer['dph_total'] // resolution), 1) for offer in candidates]
+    values = [offer_throughput(offer, weights) for offer in candidates]
+    max_count = min(max_count, steps // min(costs))  # no more offers than the cheapest one fits
+    if max_count <= 0:
+        return []
+
+    # best[count][cost]: highest value using at most `count` offers costing at most `cost` steps
+    best = [[0.0] * (steps + 1) for _ in range(max_count + 1)]
+    taken = []
+    for cost, value in zip(costs, values):
+        item_taken = set()
+        for count in range(max_count, 0, -1):
+            row, previous = best[count], best[count - 1]
+            for budget_left in range(steps, cost - 1, -1):
+                candidate = previous[budget_left - cost] + value
+                if candidate > row[budget_left]:
+                    row[budget_left] = candidate
+                    item_taken.add((count, budget_left))
+        taken.append(item_taken)
+
+    chosen = []
+    count, budget_left = max_count, steps
+    for index in range(len(candidates) - 1, -1, -1):
+        if (count, budget_left) in taken[index]:
+            chosen.append(candidates[index])
+            count -= 1
+            budget_left -= costs[index]
+    return chosen[::-1]
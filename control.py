@@ -0,0 +1,39 @@
+import asyncio
+import logging
+import os
+
+import json_codec
+
+# Constants
+CONTROL_READ_LIMIT = 1 << 20  # in bytes, longest command line accepted
+
+
+async def serve_control(path, handler):
+    """Serve JSON line commands on a local unix socket at `path`, readable by the current user only.
+
+    Each line is one request dict, `handler(request)` returns the response dict.
+    A request that fails for any reason is answered with {"ok": false, "error": ...}, the connection stays open.
+    """
+    async def on_client(reader, writer):
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                try:
+                    response = handler(json_codec.loads(line))
+                except Exception as e:
+                    response = {"ok": False, "error": str(e) or type(e).__name__}
+                writer.write(json_codec.dumps(response) + b"\n")
+                await writer.drain()
+        except (ConnectionError, asyncio.LimitOverrunError, ValueError) as e:
+            logging.warning(f"Control connection closed: {e}")
+        finally:
+            writer.close()
+
+    if os.path.exists(path):
+        os.unlink(path)  # stale socket left by a previous run
+    server = await asyncio.start_unix_server(on_client, path, limit=CONTROL_READ_LIMIT)
+    os.chmod(path, 0o600)
+    logging.info(f"Control socket listening on {path}.")
+    return server
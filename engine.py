@@ -0,0 +1,829 @@
+import asyncio
+import collections
+import copy
+import logging
+import os
+import time
+
+import json_codec
+import vast_api
+from budget import select_within_budget
+from control import serve_control
+from fleet import FleetMonitor, fetch_instances
+from health import InstanceHealth
+from ignore_store import IgnoreStore
+from journal import Journal
+from json_stream import ArrayItemStream
+from launches import LaunchStats, pick_launch
+from offer_cache import OfferCache
+from offer_filter import filter_offers
+from profiles import merge_config, normalize_config, offer_matches_criteria, read_config, union_rates
+from ranking import top_offers
+from reputation import ReputationStore
+from scheduler import SearchScheduler
+from search_planner import max_shards, plan_search_queries
+from slots import SlotLedger
+
+# Constants
+START_DELAY = 10  # in seconds, before the first attempt to check offers
+NEAR_THRESHOLD_MARGIN = 0.1  # offers within 10% above their GPU rate count as market activity
+STREAM_CHUNK_SIZE = 1 << 16  # in bytes, read size for streamed search responses
+ORDER_FALLBACK_DEPTH = 5  # ranked offers kept beyond the capacity, tried when an ordered offer is already gone
+BALANCE_PAUSE = 600  # in seconds, no orders are sent for this long after an insufficient balance error
+TERMINAL_STATUSES = ("exited", "offline")  # an instance in one of these will not come up on its own
+TERMINAL_CONFIRMATIONS = 2  # consecutive checks in a terminal status before the instance is replaced
+MONITOR_BACKOFF_FACTOR = 1.5  # poll interval multiplier after a check without progress, up to monitor_interval
+MISSING_CONFIRMATIONS = 3  # checks an accepted instance can be missing from the list before its slot is freed
+CONFIG_WATCH_INTERVAL = 5  # in seconds, between checks of the config file's modification time
+LAUNCH_FAILURE_REASONS = ("low_gpu_util", "failed_to_boot")  # failures after loading that point at the image or onstart script
+RESTART_SETTINGS = ("state_db", "journal_file", "record_payloads", "control_socket")  # only read at startup
+
+
+def classify_order_failure(status_code, data):
+    """Sort a failed order into "offer_gone", "insufficient_balance", "bad_request", "throttled" or "error"."""
+    error = f"{data.get('error', '')} {data.get('msg', '')}".lower()
+    if status_code == 429 or status_code >= 500:
+        return "throttled"
+    if "no_such_ask" in error or "no longer available" in error or status_code in (404, 410):
+        return "offer_gone"
+    if "credit" in error or "balance" in error or status_code == 402:
+        return "insufficient_balance"
+    if status_code == 400 or "invalid" in error:
+        return "bad_request"
+    return "error"
+
+
+def is_productive(instance):
+    """An instance that runs with GPU utilization >= 90%, the bar a new instance has to reach to be accepted."""
+    return instance.get('actual_status') == "running" and (instance.get('gpu_util') or 0) >= 90
+
+
+class Engine:
+    """Runs search, order placement, monitoring and destruction for one or more bot profiles on a single event loop.
+
+    `config` holds the engine-wide settings and a "profiles" dict of named profiles,
+    see profiles.SETTINGS_DEFAULTS and profiles.PROFILE_DEFAULTS. One market search
+    per tick covers the union of all rate tables, and each matching offer is routed
+    to a single profile.
+
+    With `config_path`, the file is watched and a changed config is applied at the
+    next cycle boundary, as are changes sent through the control socket.
+    """
+
+    def __init__(self, api_key, config, config_path=None):
+        self.api_key = api_key
+        self.raw_config = config
+        self.config_path = config_path
+        self.pending_config = None  # (raw config, normalized config, source) waiting for the next cycle
+        self.config = normalize_config(config)
+        self.profiles = self.config["profiles"]
+        self.gpu_dph_rates = union_rates(self.profiles)
+        self.slots = SlotLedger({name: profile["max_orders"] for name, profile in self.profiles.items()})
+        self.destroyed_instances_count = {name: 0 for name in self.profiles}
+        self.active_machines = {}  # machine_id -> offer dph_total, for machines with a pending or accepted instance
+        self.ignore_store = IgnoreStore(self.config["state_db"])
+        self.reputation = ReputationStore(self.config["state_db"], self.config["reputation_weight"])
+        self.launch_stats = LaunchStats(self.config["state_db"])
+        self.journal = Journal(self.config["journal_file"])
+        self.fleet = FleetMonitor(api_key, self.config["monitor_interval"])
+        self.monitor_tasks = set()
+        self.offer_cache = OfferCache()
+        self.scheduler = SearchScheduler(self.config["check_interval"],
+                                         self.config["check_interval_min"],
+                                         self.config["check_interval_max"])
+        self.search_throttled = False
+        self.orders_paused_until = 0
+        self.search_queries = plan_search_queries(self.config["search_criteria"], self.gpu_dph_rates,
+                                                  self.config["search_max_tiers"], self.config["search_gpu_counts"],
+                                                  NEAR_THRESHOLD_MARGIN)
+        self.order_templates = self.build_order_templates(self.profiles)
+        self.order_url_suffix = f"/?api_key={api_key}"
+        self.session_pool_size = None  # connections of the shared session, set by run()
+
+    def build_order_templates(self, profiles):
+        """Serialized order payloads per (profile, launch config), so an order only needs the offer ID filled in."""
+        templates = {}
+        for name, profile in profiles.items():
+            for launch in profile["launches"]:
+                templates[name, launch["name"]] = json_codec.dumps({
+                    "client_id": "me",
+                    "image": launch["image"],
+                    "disk": launch["disk"],
+                    "label": "bot",
+                    "onstart": launch["onstart"],
+                })
+        return templates
+
+    def pool_size(self):
+        """Connections for every search shard at once plus the order fan-out and the instance poll, so early orders never queue behind a stream.
+
+        Sized for the most shards the tier settings allow, so live rate table changes never outgrow it.
+        """
+        shards = max_shards(self.config["search_max_tiers"], self.config["search_gpu_counts"])
+        return max(vast_api.POOL_SIZE, shards + self.config["order_fanout"] + 1)
+
+    def stage_config(self, raw_config, source):
+        """Validate a new config and queue it for the next cycle boundary. Raises ValueError if it is invalid."""
+        self.pending_config = (raw_config, normalize_config(raw_config), source)
+        self.scheduler.wake()
+
+    def apply_pending_config(self):
+        """Swap in the staged config between two cycles. Monitors, caches and slot counts stay as they are.
+
+        Everything derived from the config is built before anything is swapped, a config
+        that fails there is logged and dropped so the current one keeps running.
+        """
+        if self.pending_config is None:
+            return
+        raw_config, config, source = self.pending_config
+        self.pending_config = None
+        for key in RESTART_SETTINGS:
+            if config[key] != self.config[key]:
+                logging.warning(f"Setting {key} only takes effect after a restart, keeping {self.config[key]!r}.")
+                config[key] = self.config[key]
+        try:
+            gpu_dph_rates = union_rates(config["profiles"])
+            search_queries = plan_search_queries(config["search_criteria"], gpu_dph_rates,
+                                                 config["search_max_tiers"], config["search_gpu_counts"],
+                                                 NEAR_THRESHOLD_MARGIN)
+            order_templates = self.build_order_templates(config["profiles"])
+        except Exception as e:
+            logging.error(f"Could not apply the config from {source}, keeping the current one: {e}")
+            return
+        self.raw_config = raw_config
+        self.config = config
+        self.profiles = config["profiles"]
+        self.gpu_dph_rates = gpu_dph_rates
+        self.search_queries = search_queries
+        self.order_templates = order_templates
+        self.slots.set_limits({name: profile["max_orders"] for name, profile in self.profiles.items()})
+        for name in self.profiles:
+            self.destroyed_instances_count.setdefault(name, 0)
+        self.scheduler.configure(config["check_interval"], config["check_interval_min"], config["check_interval_max"])
+        self.fleet.interval = config["monitor_interval"]
+        self.reputation.weight = config["reputation_weight"]
+        vast_api.limiter.rate = config["api_rate_limit"]
+        json_codec.use(config["json_backend"])
+        if self.session_pool_size is not None and self.pool_size() > self.session_pool_size:
+            logging.warning(f"The new config needs {self.pool_size()} pooled connections, {self.session_pool_size} are open until a restart; orders may queue behind search shards.")
+        logging.info(f"Applied new config from {source}: {self.slots.summary()} (active+pending/max), {len(self.search_queries)} search queries.")
+
+    def handle_control(self, request):
+        """Answer a control socket command: "status", "reload" (re-read the config file) or "set" (merge a partial config)."""
+        command = request.get("command") if isinstance(request, dict) else None
+        if command == "status":
+            return {
+                "ok": True,
+                "slots": {name: {"active": self.slots.active[name], "pending": self.slots.pending[name], "max": limit}
+                          for name, limit in self.slots.limits.items()},
+                "destroyed": self.destroyed_instances_count,
+                "committed_spend": self.committed_spend(),
+                "ignored_machines": len(self.ignore_store),
+                "search_interval": self.scheduler.interval,
+                "config_pending": self.pending_config is not None,
+            }
+        if command == "reload":
+            if self.config_path is None:
+                return {"ok": False, "error": "This bot was not started from a config file."}
+            self.stage_config(read_config(self.config_path), self.config_path)
+            return {"ok": True, "message": "Config file staged, it is applied at the next cycle."}
+        if command == "set":
+            base = self.raw_config if self.pending_config is None else self.pending_config[0]
+            self.stage_config(merge_config(base, request.get("config") or {}), "control socket")
+            return {"ok": True, "message": "Config change staged, it is applied at the next cycle."}
+        return {"ok": False, "error": f"Unknown command {command!r}, expected status, reload or set."}
+
+    async def watch_config_file(self):
+        """Stage the config file whenever its modification time changes."""
+        try:
+            last_mtime = os.stat(self.config_path).st_mtime
+        except OSError:
+            last_mtime = None
+        while True:
+            await asyncio.sleep(CONFIG_WATCH_INTERVAL)
+            try:
+                mtime = os.stat(self.config_path).st_mtime
+            except OSError:
+                continue
+            if mtime == last_mtime:
+                continue
+            last_mtime = mtime
+            try:
+                self.stage_config(read_config(self.config_path), self.config_path)
+                logging.info(f"Config file {self.config_path} changed, applying it at the next cycle.")
+            except Exception as e:  # the watcher must outlive any bad edit
+                logging.error(f"Ignoring the changed config file {self.config_path}: {e}")
+
+    def all_orders_placed(self):
+        return all(self.slots.full(name) for name in self.profiles)
+
+    def open_slots(self):
+        return sum(max(self.slots.available(name), 0) for name in self.profiles)
+
+    def committed_spend(self):
+        """$/h of every pending and accepted instance, at the offer price."""
+        return sum(self.active_machines.values())
+
+    def fits_budget(self, offer):
+        budget = self.config["hourly_budget"]
+        return budget is None or self.committed_spend() + offer['dph_total'] <= budget + 1e-9
+
+    async def fetch_offers(self, label, criteria):
+        """Run one planned bundles query (search shard). Returns the list of offers, or None if the query failed."""
+        start_time = time.monotonic()
+        try:
+            response = await vast_api.request("POST", "search", "/bundles/", json=criteria)
+        except vast_api.RequestError as e:
+            logging.error(f"Offers check failed for shard {label}: {e}")
+            self.search_throttled = True
+            return None
+        if response.status_code != 200:
+            if response.status_code == 429 or response.status_code >= 500:
+                self.search_throttled = True
+            logging.error(f"Offers check failed for shard {label}. Status code: {response.status_code}. Response: {response.text}")
+            return None
+        try:
+            offers = response.json().get('offers', [])
+        except ValueError as e:
+            logging.error(f"Failed to parse JSON from API response during offers check: {e}")
+            return None
+        logging.info(f"Shard {label}: {len(offers)} offers in {(time.monotonic() - start_time) * 1000:.0f} ms")
+        return offers
+
+    async def stream_offers(self, label, criteria, on_matches):
+        """Streaming variant of `fetch_offers`: offers are parsed and rate-filtered as the response arrives.
+
+        Only the matching offers are kept, each batch of them is handed to `on_matches`
+        right away. Returns (matching offers, near offers), or None if the query failed.
+        """
+        start_time = time.monotonic()
+        parser = ArrayItemStream('offers')
+        matches = []
+        total_offers = 0
+        near_offers = 0
+        try:
+            async with vast_api.stream("POST", "search", "/bundles/", json=criteria) as response:
+                if response.status != 200:
+                    if response.status == 429 or response.status >= 500:
+                        self.search_throttled = True
+                    logging.error(f"Offers check failed for shard {label}. Status code: {response.status}. Response: {await response.text()}")
+                    return None
+                async for chunk in response.content.iter_chunked(STREAM_CHUNK_SIZE):
+                    offers = parser.feed(chunk)
+                    total_offers += len(offers)
+                    chunk_matches, chunk_near = filter_offers(offers, self.gpu_dph_rates, NEAR_THRESHOLD_MARGIN,
+                                                              self.config["offer_constraints"])
+                    near_offers += chunk_near
+                    if chunk_matches:
+                        matches.extend(chunk_matches)
+                        on_matches(chunk_matches)
+                parser.close()
+        except vast_api.RequestError as e:
+            logging.error(f"Offers check failed for shard {label}: {e}")
+            self.search_throttled = True
+            return None
+        except ValueError as e:
+            logging.error(f"Failed to parse JSON from API response during offers check: {e}")
+            return None
+        logging.info(f"Shard {label}: {len(matches)}/{total_offers} offers matching in {(time.monotonic() - start_time) * 1000:.0f} ms")
+        return matches, near_offers
+
+    async def search_streamed(self):
+        """Run every shard as a streamed query. Matches can be ordered while the other shards are still being read."""
+        early_orders = []
+        early_changed = []
+
+        def on_matches(matches):
+            if not self.config["stream_early_orders"]:
+                return
+            changed_offers, actionable_offers = self.offer_cache.update(matches)
+            early_changed.extend(changed_offers)
+            if actionable_offers:
+                early_orders.append(asyncio.create_task(self.place_orders(actionable_offers)))
+
+        shard_results = await asyncio.gather(*(self.stream_offers(label, criteria, on_matches) for label, criteria in self.search_queries))
+        if early_orders:
+            await asyncio.gather(*early_orders)
+        return shard_results, early_changed
+
+    async def search_gpu(self):
+        gpu_dph_rates = self.gpu_dph_rates
+        self.search_throttled = False
+        # Every planned query is a shard, all shards run concurrently and are merged by offer id
+        streamed = self.config["search_decode"] == "stream"
+        if streamed:
+            shard_results, early_changed = await self.search_streamed()
+        else:
+            shard_results = await asyncio.gather(*(self.fetch_offers(label, criteria) for label, criteria in self.search_queries))
+        offers = {}
+        near_offers = 0
+        failed_queries = 0
+        for shard_result in shard_results:
+            if shard_result is None:
+                failed_queries += 1
+                continue
+            if streamed:
+                shard_offers, shard_near = shard_result
+                near_offers += shard_near
+            else:
+                shard_offers = shard_result
+            for offer in shard_offers:
+                offers.setdefault(offer.get('id'), offer)
+        if failed_queries == len(self.search_queries):
+            return {}
+
+        self.ignore_store.refresh()
+        self.reputation.refresh()
+        self.launch_stats.refresh()
+        placed_orders = self.slots.summary()
+        destroyed_instances = sum(self.destroyed_instances_count.values())
+        logging.info(f"\nOffers check: SUCCESS ({len(self.search_queries) - failed_queries}/{len(self.search_queries)} shards, {len(offers)} offers)\nPlaced orders (active+pending/max): {placed_orders}\nDestroyed instances: {destroyed_instances}\nIgnored machines: {len(self.ignore_store)} {self.ignore_store.summary()}\nMachines with boot history: {len(self.reputation)}")
+        queue_waits = ", ".join(f"{endpoint} {average * 1000:.0f}/{longest * 1000:.0f}" for endpoint, (_, average, longest) in vast_api.limiter.wait_stats().items())
+        logging.info(f"API queue wait avg/max (ms): {queue_waits}")
+        logging.info("GPU DPH Rates:")
+        for gpu_model, dph_rate in gpu_dph_rates.items():
+            logging.info(f"{gpu_model}: {dph_rate}/hour")
+        if streamed:
+            # Streamed shards only kept the offers that passed the filter
+            filtered_offers = list(offers.values())
+        else:
+            # Filter offers based on DPH rates per unit GPU and the extra offer constraints
+            filtered_offers, near_offers = filter_offers(list(offers.values()), gpu_dph_rates, NEAR_THRESHOLD_MARGIN,
+                                                         self.config["offer_constraints"])
+
+        # Only offers that are new, changed price or are due for a retry are acted on
+        changed_offers, actionable_offers = self.offer_cache.update(filtered_offers)
+        if streamed:
+            changed_offers = early_changed + changed_offers  # matches already seen while streaming
+        for offer in changed_offers:
+            logging.info(f"Found matching offer for {offer['gpu_name']} with dph per GPU: {offer['dph_total'] / offer.get('num_gpus', 1)}")
+        if filtered_offers:
+            logging.info(f"Matching offers found based on DPH rates per GPU: {len(filtered_offers)} matching, {len(changed_offers)} new or changed, {len(actionable_offers)} to act on.")
+        else:
+            logging.info("No matching offers found based on DPH rates per GPU.")
+        return {"offers": actionable_offers, "activity": len(changed_offers) + near_offers}
+
+    def route_offer(self, offer):
+        """Pick the profile that takes an offer: the one with the lowest rate for its GPU that has a free slot."""
+        gpu_name = offer.get('gpu_name')
+        dph_per_unit = offer['dph_total'] / offer.get('num_gpus', 1)
+        accepting = [name for name, profile in self.profiles.items()
+                     if self.slots.available(name) > 0
+                     and dph_per_unit <= profile["gpu_dph_rates"].get(gpu_name, -1)
+                     and offer_matches_criteria(offer, profile["search_criteria"])]
+        if not accepting:
+            return None
+        return min(accepting, key=lambda name: self.profiles[name]["gpu_dph_rates"][gpu_name])
+
+    async def place_order(self, profile_name, offer_id, launch_name):
+        """Send one order. Returns (outcome, instance ID), outcome is "ordered" or one of the classify_order_failure classes."""
+        payload = self.order_templates[profile_name, launch_name]
+        try:
+            response = await vast_api.request("PUT", "order", f"/asks/{offer_id}{self.order_url_suffix}",
+                                              data=payload, headers=vast_api.JSON_HEADERS)
+        except vast_api.RequestError as e:
+            logging.error(f"[{profile_name}] Error placing order for offer ID {offer_id}: {e}")
+            return "error", None
+        try:
+            data = response.json()
+        except ValueError:
+            data = None
+        if not isinstance(data, dict):
+            data = {}
+        if response.status_code == 200 and data.get('success'):
+            return "ordered", data.get('new_contract')
+        outcome = classify_order_failure(response.status_code, data)
+        logging.error(f"[{profile_name}] Order for offer ID {offer_id} failed ({outcome}). Status code: {response.status_code}. Response: {response.text}")
+        return outcome, None
+
+    async def monitor_instance_for_running_status(self, profile_name, instance_id, machine_id, offer_dph, gpu_model, launch_name, ordered_at):
+        """Watch a new instance until it runs with high GPU utilization, or destroy it.
+
+        Polls every monitor_fast_interval while the instance makes progress (status,
+        status message or a new GPU utilization high), slowing down towards
+        monitor_interval while nothing changes. Terminal statuses and no progress
+        for the profile's stall_timeout end the wait early so the slot is refilled.
+        The timeout and phase timings count from `ordered_at` (wall clock), so a
+        re-adopted instance keeps its deadline; if it is None they start now and
+        nothing is recorded to the reputation or launch stats. The instance is always
+        seen in at least one instance list before it is judged, even past its deadline.
+        """
+        profile = self.profiles[profile_name]
+        timeout = profile["monitor_timeout"]
+        fast_interval = self.config["monitor_fast_interval"]
+        slow_interval = self.config["monitor_interval"]
+        start_time = time.monotonic()
+        if ordered_at is not None:
+            start_time -= max(time.time() - ordered_at, 0)
+        record_timings = ordered_at is not None
+        end_time = start_time + timeout
+        interval = fast_interval
+        check_counter = 0  # Initialize the interval check counter
+        dph_logged = False
+        reason = "failed_to_boot"
+        last_state = None
+        best_utilization = -1
+        last_progress = time.monotonic()
+        terminal_checks = 0
+        phases = {}  # seconds to each launch phase, see launches.PHASES
+        price_changed = False
+        host_id = None
+        observed = False  # whether an instance list was fetched at all, a timed out adoption still gets one check
+        while not observed or time.monotonic() < end_time:
+            instances = await self.fleet.next_snapshot(interval)
+            check_counter += 1  # Increment the interval check counter
+            elapsed = f"{time.monotonic() - start_time:.0f}s/{timeout}s"
+            if instances is None:
+                logging.error(f"[{profile_name}] Check #{check_counter} ({elapsed}): Error fetching status for instance {instance_id}.")
+                continue
+            observed = True
+            instance_data = instances.get(instance_id, {})
+            status = instance_data.get('actual_status', 'unknown')
+            gpu_utilization = instance_data.get('gpu_util', 0)  # Get GPU utilization, default to unknown if not present
+            current_dph = instance_data.get('dph_total', 0)  # Fetch the current DPH
+            host_id = instance_data.get('host_id', host_id)
+            if status in ("loading", "running"):
+                phases.setdefault("time_to_loading", time.monotonic() - start_time)
+            if status == "running":
+                phases.setdefault("time_to_running", time.monotonic() - start_time)
+            if current_dph > offer_dph * 1.05:
+                price_changed = True
+
+            # Poll fast while the instance makes progress, back off while it does not
+            state = (status, instance_data.get('status_msg'))
+            if state != last_state or (gpu_utilization or 0) > best_utilization:
+                last_state = state
+                best_utilization = max(best_utilization, gpu_utilization or 0)
+                last_progress = time.monotonic()
+                interval = fast_interval
+            else:
+                interval = min(interval * MONITOR_BACKOFF_FACTOR, slow_interval)
+
+            # Check if current DPH is within the acceptable range
+            if not dph_logged and instance_data:  # Log the DPH check only if it has not been logged before
+                if current_dph > profile["gpu_dph_rates"].get(gpu_model, float('inf')):
+                    dph_acceptable_increase = offer_dph * 1.05
+                    if current_dph > dph_acceptable_increase:
+                        logging.warning(f"[{profile_name}] DPH has increased more than 5% from the offer price. Current DPH: {current_dph}, Offer DPH: {offer_dph}")
+                        reason = "price_jump"
+                        break
+                    else:
+                        logging.info(f"[{profile_name}] DPH check passed: Current DPH {current_dph} is within the acceptable 5% range of the offer DPH {offer_dph}.")
+                else:
+                    logging.info(f"[{profile_name}] DPH check skipped: Current DPH {current_dph} is at or below defined criteria for {gpu_model}.")
+                dph_logged = True  # Set the flag to True after logging the DPH check
+
+            terminal_checks = terminal_checks + 1 if status in TERMINAL_STATUSES else 0
+            if terminal_checks >= TERMINAL_CONFIRMATIONS:
+                logging.warning(f"[{profile_name}] Check #{check_counter} ({elapsed}): Instance {instance_id} is {status}, replacing it without waiting for the timeout.")
+                reason = "terminal_state"
+                break
+
+            if status == "running":
+                reason = "low_gpu_util"
+                if gpu_utilization is not None and gpu_utilization >= 90:
+                    logging.info(f"[{profile_name}] Check #{check_counter} ({elapsed}): Instance {instance_id} is up and running with GPU utilization at {gpu_utilization}%!")
+                    phases["time_to_productive"] = time.monotonic() - start_time
+                    if record_timings:
+                        self.reputation.record(machine_id, host_id, phases.get("time_to_running"), phases["time_to_productive"], price_changed=price_changed)
+                    if record_timings and launch_name is not None:  # unknown for instances adopted without a journal entry
+                        self.launch_stats.record(launch_name, gpu_model, phases)
+                        logging.info(f"[{profile_name}] Launch config {launch_name}: {self.launch_stats.summary(launch_name)}")
+                    return True
+                logging.info(f"[{profile_name}] Check #{check_counter} ({elapsed}): Instance {instance_id} is up and running but GPU utilization is {gpu_utilization}%. Waiting for next check...")
+            else:
+                logging.info(f"[{profile_name}] Check #{check_counter} ({elapsed}): Instance {instance_id} status: {status}. Waiting for next check...")
+
+            if time.monotonic() - last_progress >= profile["stall_timeout"]:
+                logging.warning(f"[{profile_name}] Instance {instance_id} made no progress for {profile['stall_timeout']}s (status: {status}), replacing it without waiting for the timeout.")
+                if status != "running":
+                    reason = "stalled"
+                break
+
+        # Only destroy the instance if it didn't start running or GPU utilization is less than 90%
+        logging.warning(f"[{profile_name}] Instance {instance_id} did not meet the required conditions after {check_counter} checks. Destroying this instance.")
+        if record_timings:
+            self.reputation.record(machine_id, host_id, phases.get("time_to_running"), failed=True, price_changed=price_changed)
+        # Exited, stalled or repriced instances say nothing about the launch config, only failures after the image loaded count
+        if record_timings and reason in LAUNCH_FAILURE_REASONS and "time_to_loading" in phases and launch_name is not None:
+            self.launch_stats.record(launch_name, gpu_model, phases, failed=True)
+        destroyed = await self.destroy_instance(instance_id, machine_id, reason)
+        if destroyed:
+            self.destroyed_instances_count[profile_name] += 1  # Increment the counter
+        self.journal.release(profile_name, instance_id, reason, destroyed)
+        return False
+
+    async def destroy_instance(self, instance_id, machine_id, reason):
+        try:
+            response = await vast_api.request("DELETE", "destroy", f"/instances/{instance_id}/?api_key={self.api_key}")
+            if response.status_code != 200:
+                logging.error(f"HTTP error occurred while trying to destroy instance {instance_id}: status code {response.status_code}. Response: {response.text}")
+                return False
+
+            if response.json().get('success') == True:
+                logging.info(f"Successfully destroyed instance {instance_id}.")
+                self.ignore_store.add(machine_id, reason)
+                return True
+            else:
+                logging.error(f"Failed to destroy instance {instance_id}. API did not return a success status. Response: {response.text}")
+                return False
+
+        except vast_api.RequestError as e:
+            logging.error(f"Request error occurred while trying to destroy instance {instance_id}: {e}")
+            return False
+        except Exception as e:
+            logging.error(f"An unexpected error occurred while trying to destroy instance {instance_id}: {e}")
+            return False
+
+    async def handle_instance(self, profile_name, instance_id, machine_id, offer_dph, gpu_model, launch_name, ordered_at):
+        instance_success = await self.monitor_instance_for_running_status(profile_name, instance_id, machine_id, offer_dph, gpu_model, launch_name, ordered_at)
+        if instance_success:
+            self.slots.confirm(profile_name)
+            self.journal.accept(instance_id)
+            logging.info(f"[{profile_name}] Successful orders count: {self.slots.active[profile_name]}")
+            if self.slots.full(profile_name):
+                logging.info(f"[{profile_name}] Maximum order limit reached.")
+            if self.config["health_monitoring"]:
+                await self.watch_instance_health(profile_name, instance_id, machine_id, offer_dph)
+        else:
+            self.slots.release(profile_name)
+            self.active_machines.pop(machine_id, None)
+            self.scheduler.wake()  # a slot was freed, re-evaluate right away
+
+    async def watch_instance_health(self, profile_name, instance_id, machine_id, offer_dph):
+        """Keep checking an accepted instance. On sustained degradation it is destroyed, its host ignored and its slot freed."""
+        health = InstanceHealth(offer_dph)
+        health_interval = self.config["health_interval"]
+        last_sample = 0
+        missing_checks = 0
+        reason = "gone"
+        destroyed = False
+        while True:
+            instances = await self.fleet.next_snapshot(health_interval)
+            # The shared poll runs faster while new instances are being monitored, keep one sample per health_interval
+            if instances is None or time.monotonic() - last_sample < health_interval * 0.9:
+                continue
+            last_sample = time.monotonic()
+            instance_data = instances.get(instance_id)
+            if instance_data is None:
+                missing_checks += 1
+                if missing_checks >= MISSING_CONFIRMATIONS:
+                    logging.warning(f"[{profile_name}] Instance {instance_id} is no longer listed, freeing its slot.")
+                    break
+                continue
+            missing_checks = 0
+            host_id = instance_data.get('host_id')
+            health.record(instance_data.get('gpu_util'), instance_data.get('dph_total'))
+            degradation = health.degradation(self.config["health_min_util"])
+            if degradation is None:
+                continue
+            reason = degradation
+            logging.warning(f"[{profile_name}] Instance {instance_id} is degraded ({reason}): {health.summary()}. Destroying it and ordering a replacement.")
+            destroyed = await self.destroy_instance(instance_id, machine_id, reason)
+            if destroyed:
+                self.destroyed_instances_count[profile_name] += 1
+                self.reputation.record(machine_id, host_id, failed=True, price_changed=reason == "price_increase")
+                break
+        self.journal.release(profile_name, instance_id, reason, destroyed)
+        self.slots.release(profile_name, active=True)
+        self.active_machines.pop(machine_id, None)
+        self.scheduler.wake()  # a slot was freed, re-evaluate right away
+
+    async def place_orders(self, offers, requery=True):
+        """Route offers to profiles and send the orders concurrently, one reserved slot per order.
+
+        When an offer turns out to be gone, its slot moves on to the next-ranked offer right away, and once those
+        run out the GPU models involved are searched again with a targeted query (if `requery`).
+        """
+        if time.monotonic() < self.orders_paused_until:
+            logging.warning(f"Orders are paused for another {self.orders_paused_until - time.monotonic():.0f}s after an insufficient balance error.")
+            return
+        eligible_offers = []
+        for offer in offers:
+            machine_id = offer.get('machine_id')
+            if machine_id in self.ignore_store:
+                logging.info(f"Skipping machine ID {machine_id} as it is in the ignore list.")
+                self.offer_cache.record_outcome(offer, "ignored")
+            elif machine_id not in self.active_machines and self.route_offer(offer) is not None:
+                eligible_offers.append(offer)
+
+        # Only the best offers that fit the remaining capacity are ordered, best first, a few more are kept as fallbacks
+        objective = self.config["ranking_objective"]
+        open_slots = self.open_slots()
+        penalty = self.reputation.penalty if self.config["reputation_weight"] else None  # prefer hosts that boot fast
+        budget = self.config["hourly_budget"]
+        if budget is not None:
+            # With a budget, the knapsack picks the set with the most weighted throughput, the rest are fallbacks
+            committed = self.committed_spend()
+            chosen_offers = select_within_budget(eligible_offers, budget - committed, self.config["throughput_weights"], open_slots)
+            chosen_ids = {id(offer) for offer in chosen_offers}
+            ranked_offers = top_offers(chosen_offers, len(chosen_offers), objective, penalty) + \
+                top_offers([offer for offer in eligible_offers if id(offer) not in chosen_ids], ORDER_FALLBACK_DEPTH, objective, penalty)
+            if eligible_offers:
+                logging.info(f"Budget: {committed:.3f}/{budget} $/h committed, chose {len(chosen_offers)} of {len(eligible_offers)} eligible offers "
+                             f"for {sum(offer['dph_total'] for offer in chosen_offers):.3f} $/h.")
+        else:
+            ranked_offers = top_offers(eligible_offers, open_slots + ORDER_FALLBACK_DEPTH, objective, penalty)
+            if len(ranked_offers) < len(eligible_offers):
+                logging.info(f"Ranked {len(eligible_offers)} eligible offers by {objective}, ordering the best {min(open_slots, len(ranked_offers))}.")
+        candidates = []
+        fallbacks = collections.deque()
+        for offer in ranked_offers:
+            if offer.get('machine_id') in self.active_machines:
+                continue  # another offer on the same machine ranked higher
+            profile_name = self.route_offer(offer)
+            if profile_name is None or not self.fits_budget(offer) or not self.slots.reserve(profile_name):
+                fallbacks.append(offer)
+                continue
+            self.active_machines[offer.get('machine_id')] = offer['dph_total']
+            candidates.append((profile_name, offer))
+        if not candidates:
+            return
+
+        semaphore = asyncio.Semaphore(self.config["order_fanout"])
+        gone_models = set()
+
+        def next_fallback():
+            while fallbacks:
+                offer = fallbacks.popleft()
+                if offer.get('machine_id') in self.active_machines:
+                    continue
+                profile_name = self.route_offer(offer)
+                if profile_name is not None and self.fits_budget(offer) and self.slots.reserve(profile_name):
+                    self.active_machines[offer.get('machine_id')] = offer['dph_total']
+                    return profile_name, offer
+            return None
+
+        async def fill_slot(profile_name, offer):
+            while True:
+                machine_id = offer.get('machine_id')
+                gpu_model = offer.get('gpu_name')
+                if time.monotonic() < self.orders_paused_until:
+                    outcome, instance_id = "insufficient_balance", None
+                else:
+                    async with semaphore:
+                        launch = pick_launch(self.profiles[profile_name]["launches"], offer, self.launch_stats)
+                        outcome, instance_id = await self.place_order(profile_name, offer["id"], launch["name"])
+                if outcome != "throttled":  # throttled offers stay actionable for the next cycle
+                    self.offer_cache.record_outcome(offer, "ordered" if outcome == "ordered" else "failed")
+                if instance_id:
+                    offer_dph = offer.get('dph_total')  # This captures the DPH rate for the current offer
+                    ordered_at = time.time()
+                    self.journal.order(profile_name, instance_id, machine_id, offer_dph, gpu_model, launch["name"], ordered_at)
+                    logging.info(f"[{profile_name}] Successfully placed order for {gpu_model} with machine_id: {machine_id} at {offer_dph} DPH using launch config {launch['name']}. Monitoring instance {instance_id} for 'running' status...")
+                    self.start_monitor(profile_name, instance_id, machine_id, offer_dph, gpu_model, launch["name"], ordered_at=ordered_at)
+                    return
+                self.active_machines.pop(machine_id, None)
+                self.slots.release(profile_name)
+                if outcome == "ordered":
+                    logging.error(f"[{profile_name}] Order was successful but couldn't retrieve 'new_contract' (instance ID) for machine_id: {machine_id}")
+                    return
+                logging.error(f"[{profile_name}] Failed to place order for offer ID {offer['id']} for machine_id: {machine_id}.")
+                if outcome == "insufficient_balance":
+                    if time.monotonic() >= self.orders_paused_until:
+                        logging.error(f"Insufficient balance, pausing orders for {BALANCE_PAUSE}s.")
+                        self.orders_paused_until = time.monotonic() + BALANCE_PAUSE
+                    return
+                if outcome != "offer_gone":
+                    return
+                # Someone else rented it first, move the slot on to the next-ranked offer
+                fallback = next_fallback()
+                if fallback is None:
+                    gone_models.add(gpu_model)
+                    return
+                profile_name, offer = fallback
+                logging.info(f"[{profile_name}] Offer {offer['id']} is next in line, ordering it instead.")
+
+        await asyncio.gather(*(fill_slot(profile_name, offer) for profile_name, offer in candidates))
+        if requery and gone_models and self.open_slots():
+            await self.requery_models(gone_models)
+
+    async def requery_models(self, gpu_models):
+        """Quick search limited to `gpu_models`, ordering what it finds into the slots that are still free."""
+        criteria = copy.deepcopy(self.config["search_criteria"])
+        allowed_models = (criteria.get("gpu_name") or {}).get("in")
+        criteria["gpu_name"] = {"in": [gpu_model for gpu_model in gpu_models if allowed_models is None or gpu_model in allowed_models]}
+        rates = {gpu_model: self.gpu_dph_rates[gpu_model] for gpu_model in gpu_models}
+        queries = plan_search_queries(criteria, rates, len(rates), self.config["search_gpu_counts"])
+        logging.info(f"Offers gone for {', '.join(sorted(gpu_models))}, searching these models again ({len(queries)} queries).")
+        shard_results = await asyncio.gather(*(self.fetch_offers(f"requery {label}", query) for label, query in queries))
+        offers = {offer.get('id'): offer for shard_offers in shard_results if shard_offers for offer in shard_offers}
+        filtered_offers, _ = filter_offers(list(offers.values()), self.gpu_dph_rates, NEAR_THRESHOLD_MARGIN,
+                                           self.config["offer_constraints"])
+        _, actionable_offers = self.offer_cache.update(filtered_offers)
+        await self.place_orders(actionable_offers, requery=False)
+
+    def start_monitor(self, profile_name, instance_id, machine_id, offer_dph, gpu_model, launch_name, accepted=False, ordered_at=None):
+        """Watch an instance in the background: the boot monitor for new ones, the health loop for accepted ones."""
+        if accepted:
+            if not self.config["health_monitoring"]:
+                return
+            coroutine = self.watch_instance_health(profile_name, instance_id, machine_id, offer_dph)
+        else:
+            coroutine = self.handle_instance(profile_name, instance_id, machine_id, offer_dph, gpu_model, launch_name, ordered_at)
+        task = asyncio.create_task(coroutine)
+        self.monitor_tasks.add(task)
+        task.add_done_callback(self.monitor_tasks.discard)
+
+    def adopt_instance(self, profile_name, instance_id, machine_id, offer_dph, gpu_model, launch_name, accepted, ordered_at):
+        """Take over an instance from a previous run. Returns False if the profile has no slot left for it."""
+        if profile_name not in self.profiles or not self.slots.reserve(profile_name):
+            logging.warning(f"[{profile_name}] Instance {instance_id} does not fit the current profiles or max_orders, leaving it unmanaged.")
+            return False
+        if accepted:
+            self.slots.confirm(profile_name)
+        self.active_machines[machine_id] = offer_dph
+        self.start_monitor(profile_name, instance_id, machine_id, offer_dph, gpu_model, launch_name, accepted, ordered_at)
+        logging.info(f"[{profile_name}] Re-adopted {'accepted' if accepted else 'pending'} instance {instance_id} on machine_id: {machine_id}.")
+        return True
+
+    async def restore_fleet(self):
+        """Replay the journal, check it against the live instance list and re-attach monitors to what is still there."""
+        records = self.journal.replay()
+        for name in self.profiles:
+            self.destroyed_instances_count[name] = self.journal.destroyed[name]
+        instances = await fetch_instances(self.api_key)
+        if instances is None:
+            logging.error("Could not fetch the instance list, re-adopting journaled instances without checking them.")
+        for instance_id, record in records.items():
+            profile_name = record["profile"]
+            if instances is not None and instance_id not in instances:
+                logging.info(f"[{profile_name}] Journaled instance {instance_id} no longer exists.")
+                self.journal.release(profile_name, instance_id, "gone")
+            else:
+                # A pending instance that became productive while the bot was down is accepted from the fresh list
+                accepted = record["accepted"] or (instances is not None and is_productive(instances[instance_id]))
+                if not self.adopt_instance(profile_name, instance_id, record["machine_id"], record["offer_dph"],
+                                           record["gpu_model"], record["launch"], accepted, record.get("ordered_at")):
+                    self.journal.release(profile_name, instance_id, "unmanaged")
+                elif accepted and not record["accepted"]:
+                    self.journal.accept(instance_id)
+
+        # Instances labelled by a bot but missing from the journal (e.g. a crash right after the order was sent)
+        unjournaled = [instance for instance_id, instance in (instances or {}).items()
+                       if instance.get('label') == "bot" and instance_id not in records]
+        if unjournaled and not self.config["adopt_unjournaled"]:
+            logging.warning(f"{len(unjournaled)} instances labelled 'bot' are not in the journal, leaving them alone (set adopt_unjournaled to take them over).")
+        elif unjournaled:
+            for instance in unjournaled:
+                profile_name = self.route_offer(instance) if instance.get('dph_total') is not None else None
+                accepted = is_productive(instance)
+                if profile_name is None:
+                    logging.warning(f"Instance {instance['id']} does not match any profile, leaving it unmanaged.")
+                elif self.adopt_instance(profile_name, instance['id'], instance.get('machine_id'), instance['dph_total'],
+                                         instance.get('gpu_name'), None, accepted, None):
+                    self.journal.order(profile_name, instance['id'], instance.get('machine_id'), instance['dph_total'], instance.get('gpu_name'), None, None)
+                    if accepted:
+                        self.journal.accept(instance['id'])
+        logging.info(f"Fleet restored from {self.journal.path}: {self.slots.summary()} (active+pending/max).")
+
+    async def run(self):
+        logging.info(f"JSON backend: {json_codec.use(self.config['json_backend'])}")
+        self.session_pool_size = self.pool_size()
+        await vast_api.configure(pool_size=self.session_pool_size, rate=self.config["api_rate_limit"], record_dir=self.config["record_payloads"])
+        background_tasks = []
+        control_server = None
+        try:
+            await vast_api.warm_up()
+            await self.restore_fleet()
+            if self.config_path is not None:
+                background_tasks.append(asyncio.create_task(self.watch_config_file()))
+            if self.config["control_socket"]:
+                control_server = await serve_control(self.config["control_socket"], self.handle_control)
+
+            # Add a delay before the first attempt
+            logging.info(f"Waiting for {START_DELAY} seconds before the first attempt to check offers...")
+            await asyncio.sleep(START_DELAY)
+
+            while True:
+                await self.scheduler.wait()
+                self.apply_pending_config()
+                # A bot that can be reconfigured stays up, its order caps may still be raised
+                reconfigurable = self.config_path is not None or control_server is not None
+                if self.all_orders_placed() and not self.config["health_monitoring"] and not reconfigurable:
+                    logging.info("Maximum order limit reached for every profile. Exiting...")
+                    break
+                if not self.open_slots():
+                    # Every slot is taken by an order in flight or a watched instance, wait for a monitor to free one
+                    self.scheduler.record_cycle(0, False)
+                    continue
+                search_result = await self.search_gpu()
+                await self.place_orders(search_result.get('offers', []))
+                self.scheduler.record_cycle(search_result.get('activity', 0), self.search_throttled or not search_result)
+
+            if self.monitor_tasks:
+                await asyncio.gather(*self.monitor_tasks)  # Wait for the remaining instances to be accepted or destroyed
+            logging.info("Script finished execution.")
+        finally:
+            for task in background_tasks:
+                task.cancel()
+            if control_server is not None:
+                control_server.close()
+            # Stop the monitors before the session goes, their instances stay in the journal for the next run
+            monitor_tasks = list(self.monitor_tasks)
+            for task in monitor_tasks:
+                task.cancel()
+            await asyncio.gather(*monitor_tasks, return_exceptions=True)
+            await self.fleet.close()
+            self.journal.close()
+            await vast_api.close()
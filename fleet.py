@@ -0,0 +1,94 @@
+import asyncio
+import logging
+import time
+from collections import Counter
+
+import vast_api
+
+
+async def fetch_instances(api_key):
+    """Fetch every instance on the account in a single call, keyed by instance ID."""
+    try:
+        response = await vast_api.request("GET", "instance", f"/instances/?owner=me&api_key={api_key}")
+        if response.status_code != 200:
+            logging.error(f"Error fetching instance list. Status code: {response.status_code}. Response: {response.text}")
+            return None
+        data = response.json()
+        instances = data.get('instances', []) if isinstance(data, dict) else None
+        if not isinstance(instances, list) or not all(isinstance(instance, dict) for instance in instances):
+            logging.error(f"Unexpected instance list format: {response.text[:200]}")
+            return None
+        return {instance.get('id'): instance for instance in instances}
+    except (vast_api.RequestError, ValueError) as e:
+        logging.error(f"Error fetching instance list: {e}")
+        return None
+
+
+class FleetMonitor:
+    """Polls the instance list once per interval and shares each snapshot with every waiting monitor.
+
+    Polling only runs while at least one monitor is waiting, so API calls per tick
+    stay at one no matter how many instances are being watched. The poll interval
+    is the shortest one any waiting monitor asks for.
+    """
+
+    def __init__(self, api_key, interval=30):
+        self.api_key = api_key
+        self.interval = interval
+        self._waiters = 0
+        self._intervals = Counter()  # requested poll interval -> number of waiters asking for it
+        self._reschedule = asyncio.Event()
+        self._next_snapshot = None
+        self._poll_task = None
+
+    async def next_snapshot(self, interval=None):
+        """Wait for the next instance list poll, at most `interval` seconds after the previous one.
+
+        Returns {instance_id: instance} or None if the poll failed.
+        """
+        interval = self.interval if interval is None else interval
+        if self._next_snapshot is None:
+            self._next_snapshot = asyncio.get_running_loop().create_future()
+        if self._poll_task is None or self._poll_task.done():
+            self._poll_task = asyncio.create_task(self._poll_loop())
+        snapshot = self._next_snapshot
+        self._waiters += 1
+        self._intervals[interval] += 1
+        self._reschedule.set()  # a shorter interval may move the next poll forward
+        try:
+            return await asyncio.shield(snapshot)
+        finally:
+            self._waiters -= 1
+            self._intervals[interval] -= 1
+            if not self._intervals[interval]:
+                del self._intervals[interval]
+
+    async def close(self):
+        if self._poll_task is not None and not self._poll_task.done():
+            self._poll_task.cancel()
+            await asyncio.gather(self._poll_task, return_exceptions=True)
+
+    async def _poll_loop(self):
+        try:
+            while self._waiters:
+                instances = await fetch_instances(self.api_key)
+                polled_at = time.monotonic()
+                snapshot, self._next_snapshot = self._next_snapshot, asyncio.get_running_loop().create_future()
+                snapshot.set_result(instances)
+                # Sleep until the shortest requested interval has passed, re-checking whenever a waiter joins
+                while True:
+                    self._reschedule.clear()
+                    delay = polled_at + min(self._intervals, default=self.interval) - time.monotonic()
+                    if delay <= 0:
+                        break
+                    try:
+                        await asyncio.wait_for(self._reschedule.wait(), delay)
+                    except asyncio.TimeoutError:
+                        break
+        except Exception as e:
+            logging.error(f"Instance list polling stopped on an unexpected error: {e}")
+        finally:
+            # Waiters of a poll that never happened get a failed snapshot, the next call starts a new poll loop
+            snapshot, self._next_snapshot = self._next_snapshot, None
+            if snapshot is not None and not snapshot.done():
+                snapshot.set_result(None)
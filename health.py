@@ -0,0 +1,40 @@
+from collections import deque
+
+# Constants
+HEALTH_WINDOW = 10  # samples kept per instance, one per health_interval
+DEGRADED_FRACTION = 0.8  # share of a full window that has to be bad before an instance counts as degraded
+PRICE_TOLERANCE = 0.05  # price rise over the accepted price that is still fine
+
+
+class InstanceHealth:
+    """Rolling windows of GPU utilization and price for one accepted instance.
+
+    Both windows are fixed-size ring buffers, so a long-running instance costs
+    the same memory as a new one. A single bad sample never counts, only a
+    degradation that holds for most of a full window.
+    """
+
+    def __init__(self, accepted_dph, window=HEALTH_WINDOW):
+        self.accepted_dph = accepted_dph
+        self.utilization = deque(maxlen=window)
+        self.prices = deque(maxlen=window)
+
+    def record(self, gpu_util, dph_total):
+        self.utilization.append(gpu_util or 0)
+        self.prices.append(self.accepted_dph if dph_total is None else dph_total)
+
+    def degradation(self, min_util):
+        """Reason to replace the instance ("degraded_util" or "price_increase"), or None."""
+        if len(self.utilization) < self.utilization.maxlen:
+            return None
+        bad_samples = DEGRADED_FRACTION * len(self.utilization)
+        if sum(1 for gpu_util in self.utilization if gpu_util < min_util) >= bad_samples:
+            return "degraded_util"
+        price_limit = self.accepted_dph * (1 + PRICE_TOLERANCE)
+        if sum(1 for dph_total in self.prices if dph_total > price_limit) >= bad_samples:
+            return "price_increase"
+        return None
+
+    def summary(self):
+        average = sum(self.utilization) / len(self.utilization) if self.utilization else 0
+        return f"avg GPU utilization {average:.0f}% over {len(self.utilization)} checks, price {self.prices[-1] if self.prices else None} (accepted at {self.accepted_dph})"
@@ -0,0 +1,73 @@
+import logging
+import sqlite3
+import threading
+import time
+from collections import Counter
+
+# Constants
+STATE_DB_FILE = 'bot_state.db'  # SQLite file shared by every bot process
+# How long a machine stays ignored, per reason, in seconds (None = forever)
+IGNORE_TTLS = {
+    "failed_to_boot": 7 * 24 * 3600,
+    "low_gpu_util": 3 * 24 * 3600,
+    "price_jump": 24 * 3600,
+    "terminal_state": 7 * 24 * 3600,
+    "stalled": 3 * 24 * 3600,
+    "degraded_util": 3 * 24 * 3600,
+    "price_increase": 24 * 3600,
+}
+DEFAULT_IGNORE_TTL = 24 * 3600  # for reasons missing from IGNORE_TTLS
+
+
+class IgnoreStore:
+    """Set-backed machine ignore list persisted to SQLite.
+
+    Lookups hit an in-memory dict, writes go to the database right away so the
+    list survives restarts, and `refresh()` picks up entries added by other
+    bot processes sharing the same file.
+    """
+
+    def __init__(self, path=STATE_DB_FILE, ttls=IGNORE_TTLS):
+        self.ttls = ttls
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, timeout=30, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("""CREATE TABLE IF NOT EXISTS ignored_machines (
+                                machine_id INTEGER PRIMARY KEY,
+                                reason TEXT NOT NULL,
+                                added_at REAL NOT NULL,
+                                expires_at REAL)""")
+        self._entries = {}
+        self.refresh()
+
+    def refresh(self):
+        """Reload the list from the database and drop expired entries."""
+        now = time.time()
+        with self._lock:
+            self._db.execute("DELETE FROM ignored_machines WHERE expires_at IS NOT NULL AND expires_at <= ?", (now,))
+            rows = self._db.execute("SELECT machine_id, reason, expires_at FROM ignored_machines").fetchall()
+            self._entries = {machine_id: (reason, expires_at) for machine_id, reason, expires_at in rows}
+
+    def add(self, machine_id, reason):
+        now = time.time()
+        ttl = self.ttls.get(reason, DEFAULT_IGNORE_TTL)
+        expires_at = now + ttl if ttl is not None else None
+        with self._lock:
+            self._db.execute("INSERT OR REPLACE INTO ignored_machines (machine_id, reason, added_at, expires_at) VALUES (?, ?, ?, ?)",
+                             (machine_id, reason, now, expires_at))
+            self._entries[machine_id] = (reason, expires_at)
+        logging.info(f"Added machine_id: {machine_id} to the ignore list ({reason}, {'forever' if ttl is None else f'{ttl / 3600:.0f}h'}).")
+
+    def __contains__(self, machine_id):
+        entry = self._entries.get(machine_id)
+        if entry is None:
+            return False
+        expires_at = entry[1]
+        return expires_at is None or expires_at > time.time()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def summary(self):
+        """Count of ignored machines per reason, for the status log."""
+        return dict(Counter(reason for reason, _ in self._entries.values()))
@@ -0,0 +1,96 @@
+import logging
+import os
+from collections import Counter
+
+import json_codec
+
+# Constants
+JOURNAL_FILE = 'bot_journal.jsonl'  # one file per bot process, compaction assumes a single writer
+JOURNAL_COMPACT_AFTER = 500  # appended events before the journal is rewritten with only the live instances
+
+
+class Journal:
+    """Append-only JSON lines log of order, accept and release events, so a restarted bot knows its fleet.
+
+    Every event is flushed and fsynced before the call returns. `replay()` folds
+    the file into the live instances (pending or accepted) and the destroyed
+    counts per profile, then compacts it; compaction also runs every
+    JOURNAL_COMPACT_AFTER events and swaps the file atomically.
+    """
+
+    def __init__(self, path=JOURNAL_FILE, compact_after=JOURNAL_COMPACT_AFTER):
+        self.path = path
+        self.compact_after = compact_after
+        self.instances = {}  # instance_id -> order event plus "accepted"
+        self.destroyed = Counter()  # profile -> destroyed instances
+        self._file = None
+        self._events = 0
+
+    def replay(self):
+        """Load the journal. Returns {instance_id: record} of the instances that were live when the bot stopped."""
+        if os.path.exists(self.path):
+            with open(self.path, 'rb') as file:
+                for line in file:
+                    try:
+                        self._apply(json_codec.loads(line))
+                    except ValueError:
+                        logging.warning(f"Skipping unreadable journal line in {self.path} (interrupted write).")
+        self.compact()
+        return dict(self.instances)
+
+    def _apply(self, event):
+        kind = event["event"]
+        if kind == "order":
+            self.instances[event["instance_id"]] = {**event, "accepted": event.get("accepted", False)}
+        elif kind == "accept":
+            if event["instance_id"] in self.instances:
+                self.instances[event["instance_id"]]["accepted"] = True
+        elif kind == "release":
+            self.instances.pop(event["instance_id"], None)
+            if event.get("destroyed"):
+                self.destroyed[event["profile"]] += 1
+        elif kind == "stats":
+            self.destroyed = Counter(event["destroyed"])
+
+    def _append(self, event):
+        self._apply(event)
+        if self._file is None:
+            self._file = open(self.path, 'ab')
+        self._file.write(json_codec.dumps(event) + b"\n")
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._events += 1
+        if self._events >= self.compact_after:
+            self.compact()
+
+    def order(self, profile_name, instance_id, machine_id, offer_dph, gpu_model, launch_name, ordered_at):
+        """`ordered_at` is the wall clock time of the order, None if unknown (an instance adopted without a journal entry)."""
+        self._append({"event": "order", "profile": profile_name, "instance_id": instance_id, "machine_id": machine_id,
+                      "offer_dph": offer_dph, "gpu_model": gpu_model, "launch": launch_name, "ordered_at": ordered_at})
+
+    def accept(self, instance_id):
+        self._append({"event": "accept", "instance_id": instance_id})
+
+    def release(self, profile_name, instance_id, reason, destroyed=False):
+        """The instance is no longer ours to manage: destroyed, gone from the account, or given up on."""
+        self._append({"event": "release", "profile": profile_name, "instance_id": instance_id, "reason": reason, "destroyed": destroyed})
+
+    def compact(self):
+        """Rewrite the journal with one line per live instance plus the destroyed counts."""
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        temp_path = f"{self.path}.tmp"
+        with open(temp_path, 'wb') as file:
+            file.write(json_codec.dumps({"event": "stats", "destroyed": dict(self.destroyed)}) + b"\n")
+            for record in self.instances.values():
+                file.write(json_codec.dumps(record) + b"\n")
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(temp_path, self.path)
+        self._events = 0
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
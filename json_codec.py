@@ -0,0 +1,69 @@
+import json
+import logging
+
+# Constants
+BACKEND_PREFERENCE = ("orjson", "simdjson", "ujson", "stdlib")  # order tried by "auto", fastest first
+
+
+def _stdlib():
+    return json.loads, lambda value: json.dumps(value, separators=(',', ':')).encode('utf-8')
+
+
+def _orjson():
+    import orjson
+    return orjson.loads, orjson.dumps
+
+
+def _simdjson():
+    import simdjson  # pysimdjson, only used for decoding
+    return simdjson.loads, _stdlib()[1]
+
+
+def _ujson():
+    import ujson
+    return ujson.loads, lambda value: ujson.dumps(value, ensure_ascii=False).encode('utf-8')
+
+
+# Loaders per backend, each returns (loads(bytes) -> object, dumps(object) -> bytes)
+BACKENDS = {
+    "orjson": _orjson,
+    "simdjson": _simdjson,
+    "ujson": _ujson,
+    "stdlib": _stdlib,
+}
+
+backend = "stdlib"
+loads, dumps = _stdlib()
+
+
+def available_backends():
+    """Names of the backends that can be imported here, in preference order."""
+    names = []
+    for name in BACKEND_PREFERENCE:
+        try:
+            BACKENDS[name]()
+        except ImportError:
+            continue
+        names.append(name)
+    return names
+
+
+def use(name="auto"):
+    """Switch the module-level `loads`/`dumps` to backend `name`, or the fastest installed one for "auto".
+
+    A configured backend that is not installed falls back to the stdlib with a warning.
+    Every backend raises a ValueError subclass on invalid input, so callers keep catching ValueError.
+    """
+    global backend, loads, dumps
+    if name != "auto" and name not in BACKENDS:
+        raise ValueError(f"Unknown JSON backend '{name}', expected one of: auto, {', '.join(BACKENDS)}.")
+    candidates = BACKEND_PREFERENCE if name == "auto" else (name, "stdlib")
+    for candidate in candidates:
+        try:
+            loads, dumps = BACKENDS[candidate]()
+        except ImportError:
+            if name != "auto":
+                logging.warning(f"JSON backend '{name}' is not installed, falling back to the standard library.")
+            continue
+        backend = candidate
+        return backend
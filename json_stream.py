@@ -0,0 +1,63 @@
+import codecs
+import json
+import re
+
+# Constants
+COMPACT_AFTER = 1 << 16  # drop parsed text from the buffer once this many characters were consumed
+_WHITESPACE = re.compile(r'\s*')
+
+
+class ArrayItemStream:
+    """Incremental parser for the items of one top-level array, e.g. {"offers": [...]}.
+
+    Feed it raw response chunks as they arrive; every call returns the items that
+    were completed by that chunk, so only one partial item is ever buffered.
+    """
+
+    def __init__(self, key='offers'):
+        self._array_start = re.compile(r'"%s"\s*:\s*\[' % re.escape(key))
+        self._text_decoder = codecs.getincrementaldecoder('utf-8')()
+        self._json_decoder = json.JSONDecoder()
+        self._buffer = ""
+        self._pos = 0
+        self._in_array = False
+        self.done = False
+
+    def feed(self, chunk):
+        if self.done:
+            return []
+        self._buffer += self._text_decoder.decode(chunk)
+        items = []
+        if not self._in_array:
+            match = self._array_start.search(self._buffer, self._pos)
+            if match is None:
+                return items
+            self._in_array = True
+            self._pos = match.end()
+        buffer = self._buffer
+        while True:
+            pos = _WHITESPACE.match(buffer, self._pos).end()
+            if pos >= len(buffer):
+                break
+            if buffer[pos] == ']':
+                self.done = True
+                break
+            if buffer[pos] == ',':
+                pos = _WHITESPACE.match(buffer, pos + 1).end()
+                if pos >= len(buffer):
+                    break
+            try:
+                item, end = self._json_decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError:
+                break  # item not complete yet, wait for the next chunk
+            items.append(item)
+            self._pos = end
+        if self._pos > COMPACT_AFTER:
+            self._buffer = self._buffer[self._pos:]
+            self._pos = 0
+        return items
+
+    def close(self):
+        """Check that the whole array was read once the response has ended."""
+        if not self.done:
+            raise ValueError("Response ended before the end of the array was reached.")
@@ -0,0 +1,101 @@
+import sqlite3
+import threading
+import time
+
+from ignore_store import STATE_DB_FILE
+from reputation import FAILURE_COST, PRIOR_FAILURE_RATE, PRIOR_TIME_TO_PRODUCTIVE, moving_average
+
+# Constants
+ALL_GPUS = "*"  # timings of a launch config over every GPU model, used for models it has not run on yet
+PHASES = ("time_to_loading", "time_to_running", "time_to_productive")  # seconds from the order to each phase
+LAUNCH_MIN_RUNS = 5  # runs on the newest fitting CUDA version before its history can send offers to an older one
+
+
+class LaunchStats:
+    """Boot phase timings per launch config and GPU model, persisted to SQLite.
+
+    A launch config is one entry of a profile's "launches" catalog (image, disk,
+    onstart). Every monitor run records how long the instance took to reach
+    loading, running and GPU utilization >= 90%, or that it failed after loading
+    (host problems such as exited or stalled instances are not recorded as failures).
+    """
+
+    def __init__(self, path=STATE_DB_FILE):
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, timeout=30, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("""CREATE TABLE IF NOT EXISTS launch_timings (
+                                launch TEXT NOT NULL,
+                                gpu_name TEXT NOT NULL,
+                                runs INTEGER NOT NULL,
+                                failure_rate REAL NOT NULL,
+                                time_to_loading REAL,
+                                time_to_running REAL,
+                                time_to_productive REAL,
+                                updated_at REAL NOT NULL,
+                                PRIMARY KEY (launch, gpu_name))""")
+        self._entries = {}
+        self.refresh()
+
+    def refresh(self):
+        with self._lock:
+            rows = self._db.execute(f"SELECT launch, gpu_name, runs, failure_rate, {', '.join(PHASES)} FROM launch_timings").fetchall()
+            self._entries = {(launch, gpu_name): dict(zip(("runs", "failure_rate") + PHASES, values))
+                             for launch, gpu_name, *values in rows}
+
+    def record(self, launch, gpu_name, phases, failed=False):
+        """Fold one monitor run into the timings. `phases` maps PHASES to seconds, missing phases were never reached."""
+        now = time.time()
+        with self._lock:
+            for key in ((launch, gpu_name), (launch, ALL_GPUS)):
+                entry = self._entries.get(key) or {"runs": 0, "failure_rate": PRIOR_FAILURE_RATE, **dict.fromkeys(PHASES)}
+                entry["runs"] += 1
+                entry["failure_rate"] = moving_average(entry["failure_rate"], 1.0 if failed else 0.0)
+                for phase in PHASES:
+                    if phases.get(phase) is not None:
+                        entry[phase] = moving_average(entry[phase], phases[phase])
+                self._entries[key] = entry
+                self._db.execute("INSERT OR REPLACE INTO launch_timings VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                                 (*key, entry["runs"], entry["failure_rate"], *(entry[phase] for phase in PHASES), now))
+
+    def expected_time(self, launch, gpu_name):
+        """Expected seconds until productive, failed runs charged FAILURE_COST. Untried configs get the prior."""
+        entry = self._entries.get((launch, gpu_name)) or self._entries.get((launch, ALL_GPUS))
+        if entry is None or entry["time_to_productive"] is None:
+            failure_rate = PRIOR_FAILURE_RATE if entry is None else entry["failure_rate"]
+            return PRIOR_TIME_TO_PRODUCTIVE + failure_rate * FAILURE_COST
+        return entry["time_to_productive"] + entry["failure_rate"] * FAILURE_COST
+
+    def runs(self, launch, gpu_name):
+        entry = self._entries.get((launch, gpu_name)) or self._entries.get((launch, ALL_GPUS))
+        return 0 if entry is None else entry["runs"]
+
+    def summary(self, launch):
+        entry = self._entries.get((launch, ALL_GPUS))
+        if entry is None:
+            return "no runs yet"
+        timings = ", ".join(f"{phase[8:]} {entry[phase]:.0f}s" for phase in PHASES if entry[phase] is not None)
+        return f"{entry['runs']} runs, {entry['failure_rate']:.0%} failing, {timings}"
+
+
+def pick_launch(launches, offer, stats):
+    """Fastest launch config of a profile's catalog that fits the offer's CUDA version and GPU model.
+
+    Falls back to the config with the lowest CUDA requirement if none fits, like the old image choice did.
+    Configs for older CUDA versions only compete once the newest fitting version has
+    LAUNCH_MIN_RUNS runs, so a few failures do not hand offers to an older image that
+    only looks good for lack of history.
+    """
+    cuda_max_good = offer.get('cuda_max_good') or 0
+    gpu_name = offer.get('gpu_name')
+    fitting = [launch for launch in launches
+               if launch["min_cuda"] <= cuda_max_good
+               and (launch["gpu_names"] is None or gpu_name in launch["gpu_names"])]
+    if not fitting:
+        return min(launches, key=lambda launch: launch["min_cuda"])
+    newest_cuda = max(launch["min_cuda"] for launch in fitting)
+    newest = [launch for launch in fitting if launch["min_cuda"] == newest_cuda]
+    if sum(stats.runs(launch["name"], gpu_name) for launch in newest) < LAUNCH_MIN_RUNS:
+        fitting = newest
+    # Ties (e.g. no history yet) go to the newest CUDA version, the old default
+    return min(fitting, key=lambda launch: (stats.expected_time(launch["name"], gpu_name), -launch["min_cuda"]))
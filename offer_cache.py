@@ -0,0 +1,67 @@
+import time
+from collections import OrderedDict
+
+# Constants
+OFFER_CACHE_SIZE = 5000  # max number of offers remembered, least recently seen are evicted first
+OFFER_RETRY_AFTER = 300  # in seconds, before an unchanged offer that failed or was skipped is tried again
+
+
+class OfferCache:
+    """Per-offer state kept between search cycles, keyed by (offer id, machine_id).
+
+    Each entry records first_seen, last_seen, last_price, last_outcome and
+    outcome_time, so a cycle only has to act on offers that are new, changed
+    price, or are due for a retry.
+    """
+
+    def __init__(self, max_size=OFFER_CACHE_SIZE, retry_after=OFFER_RETRY_AFTER):
+        self.max_size = max_size
+        self.retry_after = retry_after
+        self._entries = OrderedDict()
+
+    @staticmethod
+    def key(offer):
+        return offer.get('id'), offer.get('machine_id')
+
+    def update(self, offers, now=None):
+        """Record a search snapshot. Returns (changed, actionable) lists of offers.
+
+        `changed` holds the offers that are new or whose price moved, `actionable`
+        additionally holds offers that were never tried or whose retry delay is over.
+        """
+        now = time.time() if now is None else now
+        changed = []
+        actionable = []
+        for offer in offers:
+            key = self.key(offer)
+            price = offer.get('dph_total')
+            entry = self._entries.get(key)
+            if entry is None or entry["last_price"] != price:
+                if entry is None:
+                    entry = {"first_seen": now, "last_outcome": None, "outcome_time": None}
+                    self._entries[key] = entry
+                else:
+                    entry["last_outcome"] = None  # a new price makes it a new offer for us
+                entry["last_price"] = price
+                changed.append(offer)
+                actionable.append(offer)
+            elif entry["last_outcome"] is None or (entry["last_outcome"] != "ordered" and now - entry["outcome_time"] >= self.retry_after):
+                actionable.append(offer)
+            entry["last_seen"] = now
+            self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+        return changed, actionable
+
+    def record_outcome(self, offer, outcome, now=None):
+        """Remember what happened to an offer: "ordered", "failed" or "ignored"."""
+        entry = self._entries.get(self.key(offer))
+        if entry is not None:
+            entry["last_outcome"] = outcome
+            entry["outcome_time"] = time.time() if now is None else now
+
+    def get(self, offer):
+        return self._entries.get(self.key(offer))
+
+    def __len__(self):
+        return len(self._entries)
@@ -0,0 +1,93 @@
+import itertools
+import operator
+
+from profiles import offer_matches_criteria
+
+try:
+    import numpy as np
+except ImportError:  # numpy is optional, the plain loop is used without it
+    np = None
+
+# Constants
+VECTORIZE_MIN_OFFERS = 200  # below this many offers the plain loop is faster than building columns
+NUMERIC_COLUMNS = ("dph_total", "num_gpus", "cuda_max_good", "reliability", "dlperf")
+COLUMN_OPERATORS = {
+    "eq": operator.eq,
+    "neq": operator.ne,
+    "gt": operator.gt,
+    "gte": operator.ge,
+    "lt": operator.lt,
+    "lte": operator.le,
+}
+
+
+def filter_offers(offers, gpu_dph_rates, near_margin, constraints=None):
+    """Keep offers whose price per GPU is within `gpu_dph_rates` and that pass `constraints`.
+
+    `constraints` uses the bundles criteria format on offer fields. Returns
+    (matching offers, number of offers priced within `near_margin` above their rate).
+    """
+    constraints = constraints or {}
+    if np is not None and len(offers) >= VECTORIZE_MIN_OFFERS:
+        return _filter_columnar(offers, gpu_dph_rates, near_margin, constraints)
+    return _filter_loop(offers, gpu_dph_rates, near_margin, constraints)
+
+
+def _filter_loop(offers, gpu_dph_rates, near_margin, constraints):
+    filtered_offers = []
+    near_offers = 0
+    for offer in offers:
+        gpu_name = offer.get('gpu_name')
+        num_gpus = offer.get('num_gpus', 1)  # Assume 1 if not specified
+        dph_total = offer.get('dph_total')
+        if gpu_name in gpu_dph_rates and dph_total is not None:
+            dph_per_unit = dph_total / num_gpus
+            if dph_per_unit <= gpu_dph_rates[gpu_name]:
+                if offer_matches_criteria(offer, constraints):
+                    filtered_offers.append(offer)
+            elif dph_per_unit <= gpu_dph_rates[gpu_name] * (1 + near_margin):
+                near_offers += 1
+    return filtered_offers, near_offers
+
+
+def _column(offers, field, default=None):
+    # itemgetter keeps the extraction in C, offers missing the field take the slower .get() path.
+    # numpy turns None into NaN for float arrays, which every comparison treats as False.
+    try:
+        return np.fromiter(map(operator.itemgetter(field), offers), dtype=np.float64, count=len(offers))
+    except (KeyError, TypeError):
+        return np.array([offer.get(field, default) for offer in offers], dtype=np.float64)
+
+
+def _filter_columnar(offers, gpu_dph_rates, near_margin, constraints):
+    # GPU name as a categorical code, unknown models map to the trailing NaN rate
+    gpu_models = list(gpu_dph_rates)
+    gpu_codes = {gpu_model: code for code, gpu_model in enumerate(gpu_models)}
+    try:
+        gpu_names = list(map(operator.itemgetter('gpu_name'), offers))
+    except KeyError:
+        gpu_names = [offer.get('gpu_name') for offer in offers]
+    codes = np.fromiter(map(gpu_codes.get, gpu_names, itertools.repeat(len(gpu_models))), dtype=np.intp, count=len(offers))
+    rates = np.append(np.array([gpu_dph_rates[gpu_model] for gpu_model in gpu_models], dtype=np.float64), np.nan)[codes]
+
+    dph_per_unit = _column(offers, 'dph_total') / _column(offers, 'num_gpus', 1)
+    within_rate = dph_per_unit <= rates  # NaN prices and unknown models compare False
+    near = ~within_rate & (dph_per_unit <= rates * (1 + near_margin))
+
+    mask = within_rate
+    other_constraints = {}
+    for field, condition in constraints.items():
+        if not isinstance(condition, dict):
+            continue
+        column = _column(offers, field) if field in NUMERIC_COLUMNS else None
+        for op, limit in condition.items():
+            if column is None or op not in COLUMN_OPERATORS:
+                other_constraints.setdefault(field, {})[op] = limit
+                continue
+            present = ~np.isnan(column)  # missing fields are not checked, same as offer_matches_criteria
+            mask = mask & (~present | COLUMN_OPERATORS[op](column, limit))
+    filtered_offers = [offers[index] for index in np.flatnonzero(mask)]
+    # Non-numeric constraints are rare, check them on the surviving rows only
+    if other_constraints:
+        filtered_offers = [offer for offer in filtered_offers if offer_matches_criteria(offer, other_constraints)]
+    return filtered_offers, int(near.sum())
@@ -0,0 +1,260 @@
+import copy
+import json
+
+from json_codec import BACKENDS as JSON_BACKENDS
+from ranking import OBJECTIVES
+
+# Constants
+ONSTART_SCRIPT = "sudo apt update && sudo apt -y install wget && sudo wget https://raw.githubusercontent.com/tr4avler/xgpu/main/vast14.sh && sudo chmod +x vast14.sh && sudo ./vast14.sh"
+# Engine-wide settings, shared by every profile
+SETTINGS_DEFAULTS = {
+    "search_criteria": {
+        "verified": {},
+        "external": {"eq": False},
+        "rentable": {"eq": True},
+        "cuda_max_good": {"gte": 11},
+        "type": "on-demand",
+        "intended_status": "running"
+    },
+    "check_interval": 30,
+    "check_interval_min": None,  # defaults to check_interval / 2
+    "check_interval_max": None,  # defaults to check_interval * 4
+    "monitor_interval": 30,  # slowest poll interval of a monitor, used once an instance stops changing
+    "monitor_fast_interval": 10,  # poll interval while a new instance is making progress
+    "health_monitoring": True,  # keep watching accepted instances and replace degraded ones (the engine then never exits)
+    "health_interval": 60,  # in seconds, between health samples of an accepted instance
+    "health_min_util": 50,  # GPU utilization % below which a health sample counts as degraded
+    "reputation_weight": 1.0,  # how strongly host boot history affects ranking, 0 to ignore it
+    "order_fanout": 5,
+    "search_max_tiers": 2,
+    "search_gpu_counts": [1, 2, 4, 8],
+    "api_rate_limit": 2,
+    "state_db": "bot_state.db",
+    "journal_file": "bot_journal.jsonl",  # order/accept/release log, one per bot process
+    "adopt_unjournaled": False,  # on restart, take over instances labelled "bot" that are not in the journal
+    "control_socket": None,  # path of a local unix socket for bot_ctl.py (status, reload, set), None to disable
+    "ranking_objective": "dph_per_gpu",  # one of ranking.OBJECTIVES
+    "offer_constraints": {},  # extra filters for every offer, checked client-side (e.g. {"reliability": {"gte": 0.98}})
+    "search_decode": "buffered",  # "stream" parses and filters the bundles response while it arrives
+    "stream_early_orders": True,  # with "stream", order matches before the rest of the response is read
+    "json_backend": "auto",  # one of json_codec.BACKENDS, or "auto" for the fastest one installed
+    "record_payloads": None,  # directory to save search and instance responses to, for bench_json.py
+    "hourly_budget": None,  # total $/h for every pending and running instance, None for no cap
+    "throughput_weights": {},  # relative throughput per GPU by model (e.g. {"RTX 4090": 1.0, "RTX 3060": 0.3}), 1.0 if missing
+}
+SEARCH_DECODE_MODES = ("buffered", "stream")
+# Per-profile settings, gpu_dph_rates is required
+PROFILE_DEFAULTS = {
+    "max_orders": 10,
+    "monitor_timeout": 1200,
+    "stall_timeout": 600,  # in seconds, a new instance without any progress for this long is replaced
+    "images": {"12": "nvidia/cuda:12.0.1-devel-ubuntu20.04", "11": "nvidia/cuda:11.1.1-devel-ubuntu20.04"},  # by CUDA major
+    "disk": 8,
+    "onstart": ONSTART_SCRIPT,
+    "launches": None,  # launch catalog, see LAUNCH_DEFAULTS; None builds one entry per "images" item
+    "search_criteria": {},  # extra filters, checked client-side against each offer
+}
+# Per launch config of a profile's catalog, "name" and "image" are required. Pre-baked images with the
+# miner already installed only need a short onstart, e.g. {"name": "prebaked-12", "image": "me/xgpu:cuda12", "onstart": "./vast14.sh", "min_cuda": 12}
+LAUNCH_DEFAULTS = {
+    "disk": None,  # defaults to the profile's disk
+    "onstart": None,  # defaults to the profile's onstart
+    "min_cuda": 0,  # lowest cuda_max_good the image runs on
+    "gpu_names": None,  # GPU models the config is meant for, None for every model
+}
+
+
+def _is_number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def _is_count(value):
+    return isinstance(value, int) and not isinstance(value, bool)
+
+
+# (expected, check) per setting, so a typo in a live config change is rejected instead of crashing the engine later
+POSITIVE = ("a number > 0", lambda value: _is_number(value) and value > 0)
+NON_NEGATIVE = ("a number >= 0", lambda value: _is_number(value) and value >= 0)
+FLAG = ("true or false", lambda value: isinstance(value, bool))
+TEXT = ("a string", lambda value: isinstance(value, str))
+OPTIONAL_TEXT = ("a string or null", lambda value: value is None or isinstance(value, str))
+MAPPING = ("an object", lambda value: isinstance(value, dict))
+SETTINGS_CHECKS = {
+    "search_criteria": MAPPING,
+    "check_interval": POSITIVE,
+    "check_interval_min": POSITIVE,
+    "check_interval_max": POSITIVE,
+    "monitor_interval": POSITIVE,
+    "monitor_fast_interval": POSITIVE,
+    "health_monitoring": FLAG,
+    "health_interval": POSITIVE,
+    "health_min_util": NON_NEGATIVE,
+    "reputation_weight": NON_NEGATIVE,
+    "order_fanout": ("a whole number >= 1", lambda value: _is_count(value) and value >= 1),
+    "search_max_tiers": ("a whole number >= 1", lambda value: _is_count(value) and value >= 1),
+    "search_gpu_counts": ("a list of whole numbers >= 1",
+                          lambda value: isinstance(value, list) and all(_is_count(count) and count >= 1 for count in value)),
+    "api_rate_limit": POSITIVE,
+    "state_db": TEXT,
+    "journal_file": TEXT,
+    "adopt_unjournaled": FLAG,
+    "control_socket": OPTIONAL_TEXT,
+    "offer_constraints": MAPPING,
+    "stream_early_orders": FLAG,
+    "record_payloads": OPTIONAL_TEXT,
+    "hourly_budget": ("a number > 0 or null", lambda value: value is None or (_is_number(value) and value > 0)),
+    "throughput_weights": ("an object of numbers >= 0",
+                           lambda value: isinstance(value, dict) and all(_is_number(weight) and weight >= 0 for weight in value.values())),
+}
+PROFILE_CHECKS = {
+    "gpu_dph_rates": ("an object of numbers > 0",
+                      lambda value: isinstance(value, dict) and all(_is_number(rate) and rate > 0 for rate in value.values())),
+    "max_orders": ("a whole number >= 0", lambda value: _is_count(value) and value >= 0),
+    "monitor_timeout": POSITIVE,
+    "stall_timeout": POSITIVE,
+    "images": MAPPING,
+    "disk": POSITIVE,
+    "onstart": TEXT,
+    "launches": ("a list of objects or null", lambda value: value is None or (isinstance(value, list) and all(isinstance(launch, dict) for launch in value))),
+    "search_criteria": MAPPING,
+}
+LAUNCH_CHECKS = {
+    "name": TEXT,
+    "image": TEXT,
+    "disk": POSITIVE,
+    "onstart": TEXT,
+    "min_cuda": NON_NEGATIVE,
+    "gpu_names": ("a list of strings or null", lambda value: value is None or (isinstance(value, list) and all(isinstance(name, str) for name in value))),
+}
+CRITERIA_OPERATORS = {
+    "eq": lambda value, limit: value == limit,
+    "neq": lambda value, limit: value != limit,
+    "gt": lambda value, limit: value > limit,
+    "gte": lambda value, limit: value >= limit,
+    "lt": lambda value, limit: value < limit,
+    "lte": lambda value, limit: value <= limit,
+    "in": lambda value, limit: value in limit,
+    "notin": lambda value, limit: value not in limit,
+}
+
+
+def _check_values(where, values, checks):
+    for key, (expected, valid) in checks.items():
+        if not valid(values[key]):
+            raise ValueError(f"{where}{key} must be {expected}, got {values[key]!r}.")
+
+
+def normalize_config(config):
+    """Fill in defaults and check a config dict of settings plus a "profiles" dict of named profiles.
+
+    Raises ValueError for anything the engine could not run with, including wrong value types.
+    """
+    if not isinstance(config, dict):
+        raise ValueError("Config must be a JSON object.")
+    normalized = copy.deepcopy(SETTINGS_DEFAULTS)
+    normalized.update({key: value for key, value in config.items() if key != "profiles"})
+    if not POSITIVE[1](normalized["check_interval"]):
+        raise ValueError(f"check_interval must be {POSITIVE[0]}, got {normalized['check_interval']!r}.")
+    if normalized["check_interval_min"] is None:
+        normalized["check_interval_min"] = normalized["check_interval"] / 2
+    if normalized["check_interval_max"] is None:
+        normalized["check_interval_max"] = normalized["check_interval"] * 4
+    _check_values("", normalized, SETTINGS_CHECKS)
+    if normalized["check_interval_min"] > normalized["check_interval_max"]:
+        raise ValueError("check_interval_min must not be above check_interval_max.")
+    if normalized["ranking_objective"] not in OBJECTIVES:
+        raise ValueError(f"Unknown ranking objective '{normalized['ranking_objective']}', expected one of: {', '.join(OBJECTIVES)}.")
+    if normalized["search_decode"] not in SEARCH_DECODE_MODES:
+        raise ValueError(f"Unknown search_decode '{normalized['search_decode']}', expected one of: {', '.join(SEARCH_DECODE_MODES)}.")
+    if normalized["json_backend"] != "auto" and normalized["json_backend"] not in JSON_BACKENDS:
+        raise ValueError(f"Unknown JSON backend '{normalized['json_backend']}', expected one of: auto, {', '.join(JSON_BACKENDS)}.")
+    profiles = config.get("profiles") or {}
+    if not isinstance(profiles, dict):
+        raise ValueError("profiles must be an object of named profiles.")
+    if not profiles:
+        raise ValueError("Config does not define any profiles.")
+    normalized["profiles"] = {}
+    for name, profile in profiles.items():
+        if not isinstance(profile, dict):
+            raise ValueError(f"Profile '{name}' must be an object, got {profile!r}.")
+        if not profile.get("gpu_dph_rates"):
+            raise ValueError(f"Profile '{name}' has no gpu_dph_rates.")
+        merged = copy.deepcopy(PROFILE_DEFAULTS)
+        merged.update(copy.deepcopy(profile))
+        _check_values(f"Profile '{name}': ", merged, PROFILE_CHECKS)
+        merged["images"] = {int(cuda_major): image for cuda_major, image in merged["images"].items()}
+        merged["launches"] = _normalize_launches(name, merged)
+        normalized["profiles"][name] = merged
+    return normalized
+
+
+def _normalize_launches(profile_name, profile):
+    launches = profile["launches"]
+    if launches is None:
+        launches = [{"name": f"cuda{cuda_major}", "image": image, "min_cuda": cuda_major} for cuda_major, image in profile["images"].items()]
+    normalized = []
+    for launch in launches:
+        if not launch.get("name") or not launch.get("image"):
+            raise ValueError(f"Profile '{profile_name}' has a launch config without a name or image.")
+        merged = copy.deepcopy(LAUNCH_DEFAULTS)
+        merged.update(launch)
+        merged["disk"] = profile["disk"] if merged["disk"] is None else merged["disk"]
+        merged["onstart"] = profile["onstart"] if merged["onstart"] is None else merged["onstart"]
+        _check_values(f"Profile '{profile_name}' launch config '{merged['name']}': ", merged, LAUNCH_CHECKS)
+        normalized.append(merged)
+    if not normalized:
+        raise ValueError(f"Profile '{profile_name}' has no launch configs.")
+    if len({launch["name"] for launch in normalized}) < len(normalized):
+        raise ValueError(f"Profile '{profile_name}' has launch configs with the same name.")
+    return normalized
+
+
+def read_config(path):
+    """Raw contents of a JSON profiles file, not normalized."""
+    with open(path, 'r') as file:
+        return json.load(file)
+
+
+def load_config(path):
+    """Load and normalize a JSON profiles file."""
+    return normalize_config(read_config(path))
+
+
+def merge_config(config, patch):
+    """New raw config with `patch` applied recursively: objects are merged key by key, other values replaced.
+
+    A key set to None in the patch is removed (a profile, one GPU rate, or a setting
+    that then falls back to its default), an unknown key is added. So
+    {"profiles": {"main": {"gpu_dph_rates": {"RTX 4090": 0.13}}}} changes one rate only.
+    """
+    merged = copy.deepcopy(config)
+    for key, value in patch.items():
+        if value is None:
+            merged.pop(key, None)
+        elif isinstance(value, dict) and isinstance(merged.get(key), dict):
+            merged[key] = merge_config(merged[key], value)
+        else:
+            merged[key] = copy.deepcopy(value)
+    return merged
+
+
+def union_rates(profiles):
+    """Highest rate any profile accepts, per GPU model. Used for the shared market search."""
+    rates = {}
+    for profile in profiles.values():
+        for gpu_model, dph_rate in profile["gpu_dph_rates"].items():
+            rates[gpu_model] = max(dph_rate, rates.get(gpu_model, dph_rate))
+    return rates
+
+
+def offer_matches_criteria(offer, criteria):
+    """Check an offer against bundles-style criteria; fields missing from the offer are not checked."""
+    for field, condition in criteria.items():
+        if not isinstance(condition, dict) or field not in offer:
+            continue
+        for op, limit in condition.items():
+            check = CRITERIA_OPERATORS.get(op)
+            if check is not None and not check(offer[field], limit):
+                return False
+    return True
+
@@ -0,0 +1,44 @@
+import heapq
+
+# Constants
+DEFAULT_OBJECTIVE = "dph_per_gpu"
+
+
+def dph_per_gpu(offer):
+    return offer['dph_total'] / offer.get('num_gpus', 1)
+
+
+def dlperf_per_dollar(offer):
+    dph_total = offer['dph_total']
+    return -(offer.get('dlperf') or 0) / dph_total if dph_total > 0 else float('-inf')
+
+
+def reliability_weighted_price(offer):
+    reliability = offer.get('reliability2', offer.get('reliability')) or 0
+    return dph_per_gpu(offer) / reliability if reliability > 0 else float('inf')
+
+
+# Score functions per objective, lower score is better
+OBJECTIVES = {
+    "dph_per_gpu": dph_per_gpu,
+    "dlperf_per_dollar": dlperf_per_dollar,
+    "reliability_weighted_price": reliability_weighted_price,
+}
+
+
+def _penalized(score, factor):
+    # A factor >= 1 always makes the score worse, whichever sign the objective uses
+    return score * factor if score >= 0 else score / factor
+
+
+def top_offers(offers, k, objective=DEFAULT_OBJECTIVE, penalty=None):
+    """Best `k` offers by `objective`, best first. Uses a bounded heap of size k.
+
+    `penalty(offer)` returns a factor >= 1 that makes an offer look that much worse, e.g. for slow hosts.
+    """
+    if k <= 0:
+        return []
+    score = OBJECTIVES[objective]
+    if penalty is not None:
+        return heapq.nsmallest(k, offers, key=lambda offer: _penalized(score(offer), penalty(offer)))
+    return heapq.nsmallest(k, offers, key=score)
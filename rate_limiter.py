@@ -0,0 +1,83 @@
+import asyncio
+import heapq
+import itertools
+import logging
+import time
+
+# Constants
+RATE_LIMIT = 2.0  # requests per second across the whole process
+RATE_BURST = 10  # requests that can be sent back to back after a quiet period
+THROTTLE_PAUSE = 5  # in seconds, pause after a throttle response without a Retry-After header
+# Lower value goes first: orders and destroys never wait behind searches
+PRIORITIES = {
+    "order": 0,
+    "destroy": 0,
+    "instance": 1,
+    "root": 1,
+    "search": 2,
+}
+
+
+class RateLimiter:
+    """Process-wide token bucket shared by every API call, served in priority order."""
+
+    def __init__(self, rate=RATE_LIMIT, burst=RATE_BURST):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = burst
+        self._last_refill = time.monotonic()
+        self._paused_until = 0.0
+        self._waiters = []
+        self._sequence = itertools.count()
+        self._dispatcher = None
+        self._stats = {}
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.burst, self._tokens + (now - self._last_refill) * self.rate)
+        self._last_refill = now
+        return now
+
+    async def acquire(self, endpoint):
+        """Wait for a token. Returns the time spent queueing, in seconds."""
+        start_time = self._refill()
+        if not self._waiters and start_time >= self._paused_until and self._tokens >= 1:
+            self._tokens -= 1
+        else:
+            future = asyncio.get_running_loop().create_future()
+            heapq.heappush(self._waiters, (PRIORITIES.get(endpoint, 1), next(self._sequence), future))
+            if self._dispatcher is None or self._dispatcher.done():
+                self._dispatcher = asyncio.create_task(self._dispatch())
+            await future
+        waited = time.monotonic() - start_time
+        stats = self._stats.setdefault(endpoint, {"requests": 0, "total_wait": 0.0, "max_wait": 0.0})
+        stats["requests"] += 1
+        stats["total_wait"] += waited
+        stats["max_wait"] = max(stats["max_wait"], waited)
+        return waited
+
+    async def _dispatch(self):
+        while self._waiters:
+            now = self._refill()
+            if now < self._paused_until:
+                await asyncio.sleep(self._paused_until - now)
+                continue
+            if self._tokens < 1:
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+                continue
+            _, _, future = heapq.heappop(self._waiters)
+            if not future.done():  # skip callers that were cancelled while queued
+                self._tokens -= 1
+                future.set_result(None)
+
+    def throttle(self, retry_after=None):
+        """Pause every request after the server answered with a throttle response."""
+        pause = retry_after if retry_after is not None else THROTTLE_PAUSE
+        self._paused_until = max(self._paused_until, time.monotonic() + pause)
+        self._tokens = 0
+        logging.warning(f"API throttled the bot, pausing all requests for {pause}s.")
+
+    def wait_stats(self):
+        """Queue wait per endpoint: {endpoint: (requests, average wait, max wait)} in seconds."""
+        return {endpoint: (stats["requests"], stats["total_wait"] / stats["requests"], stats["max_wait"])
+                for endpoint, stats in self._stats.items()}
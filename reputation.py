@@ -0,0 +1,89 @@
+import sqlite3
+import threading
+import time
+
+from ignore_store import STATE_DB_FILE
+
+# Constants
+REPUTATION_ALPHA = 0.3  # weight of the newest run in the moving averages
+PRIOR_TIME_TO_PRODUCTIVE = 600  # in seconds, assumed for machines and hosts without history
+PRIOR_FAILURE_RATE = 0.1
+FAILURE_COST = 1800  # in seconds of idle billing, charged per expected failed run
+PRICE_CHANGE_COST = 1800  # in seconds of idle billing, charged per expected price change
+REPUTATION_HORIZON = 6 * 3600  # in seconds, expected lifetime an instance's idle time is spread over
+
+
+class ReputationStore:
+    """Boot performance per machine_id and per host_id, persisted to SQLite.
+
+    Every monitor run updates moving averages of time to running, time to
+    productive (GPU utilization >= 90%), failure rate and price changes, for the
+    machine and for its host. `penalty()` turns them into a ranking factor, so
+    hosts that historically become productive fast are preferred. New machines
+    fall back to their host's history, then to the priors.
+    """
+
+    def __init__(self, path=STATE_DB_FILE, weight=1.0):
+        self.weight = weight
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, timeout=30, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("""CREATE TABLE IF NOT EXISTS reputation (
+                                kind TEXT NOT NULL,
+                                key INTEGER NOT NULL,
+                                runs INTEGER NOT NULL,
+                                time_to_running REAL,
+                                time_to_productive REAL NOT NULL,
+                                failure_rate REAL NOT NULL,
+                                price_change_rate REAL NOT NULL,
+                                updated_at REAL NOT NULL,
+                                PRIMARY KEY (kind, key))""")
+        self._entries = {}
+        self.refresh()
+
+    def refresh(self):
+        """Reload every entry, picking up runs recorded by other bot processes."""
+        with self._lock:
+            rows = self._db.execute("SELECT kind, key, runs, time_to_running, time_to_productive, failure_rate, price_change_rate FROM reputation").fetchall()
+            self._entries = {(kind, key): {"runs": runs, "time_to_running": time_to_running, "time_to_productive": time_to_productive,
+                                           "failure_rate": failure_rate, "price_change_rate": price_change_rate}
+                             for kind, key, runs, time_to_running, time_to_productive, failure_rate, price_change_rate in rows}
+
+    def record(self, machine_id, host_id, time_to_running=None, time_to_productive=None, failed=False, price_changed=False):
+        """Fold one monitor run into the machine's and the host's history. Times are in seconds, None if never reached."""
+        now = time.time()
+        with self._lock:
+            for kind, key in (("machine", machine_id), ("host", host_id)):
+                if key is None:
+                    continue
+                entry = self._entries.get((kind, key)) or {"runs": 0, "time_to_running": None, "time_to_productive": PRIOR_TIME_TO_PRODUCTIVE,
+                                                           "failure_rate": PRIOR_FAILURE_RATE, "price_change_rate": 0.0}
+                entry["runs"] += 1
+                if time_to_running is not None:
+                    entry["time_to_running"] = moving_average(entry["time_to_running"], time_to_running)
+                if time_to_productive is not None:
+                    entry["time_to_productive"] = moving_average(entry["time_to_productive"], time_to_productive)
+                entry["failure_rate"] = moving_average(entry["failure_rate"], 1.0 if failed else 0.0)
+                entry["price_change_rate"] = moving_average(entry["price_change_rate"], 1.0 if price_changed else 0.0)
+                self._entries[kind, key] = entry
+                self._db.execute("INSERT OR REPLACE INTO reputation VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                                 (kind, key, entry["runs"], entry["time_to_running"], entry["time_to_productive"],
+                                  entry["failure_rate"], entry["price_change_rate"], now))
+
+    def expected_idle(self, machine_id, host_id):
+        """Expected seconds billed before an instance on this machine is productive, including failed runs and price changes."""
+        entry = self._entries.get(("machine", machine_id)) or self._entries.get(("host", host_id))
+        if entry is None:
+            return PRIOR_TIME_TO_PRODUCTIVE + PRIOR_FAILURE_RATE * FAILURE_COST
+        return entry["time_to_productive"] + entry["failure_rate"] * FAILURE_COST + entry["price_change_rate"] * PRICE_CHANGE_COST
+
+    def penalty(self, offer):
+        """Ranking factor >= 1 for an offer: its price spread over the expected productive part of REPUTATION_HORIZON."""
+        return 1 + self.weight * self.expected_idle(offer.get('machine_id'), offer.get('host_id')) / REPUTATION_HORIZON
+
+    def __len__(self):
+        return sum(1 for kind, _ in self._entries if kind == "machine")
+
+
+def moving_average(current, sample):
+    return sample if current is None else current + REPUTATION_ALPHA * (sample - current)
@@ -0,0 +1,64 @@
+import asyncio
+import logging
+import random
+import time
+
+# Constants
+SPEEDUP_FACTOR = 0.5  # interval multiplier after a cycle that saw offers near our thresholds
+QUIET_BACKOFF_FACTOR = 1.25  # interval multiplier after a quiet cycle
+THROTTLE_BACKOFF_FACTOR = 2.0  # interval multiplier after HTTP 429/5xx or a failed search
+JITTER = 0.1  # +/- fraction of the interval added to every deadline
+
+
+class SearchScheduler:
+    """Adaptive search scheduler built on monotonic deadlines.
+
+    The interval shrinks towards `min_interval` while offers near our thresholds
+    keep appearing, grows towards `max_interval` during quiet periods and after
+    throttling, and `wake()` cuts the current wait short (e.g. when capacity frees up).
+    """
+
+    def __init__(self, interval, min_interval, max_interval, jitter=JITTER):
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.interval = min(max(interval, min_interval), max_interval)
+        self.jitter = jitter
+        self.deadline = time.monotonic()  # first search happens immediately
+        self._wake = asyncio.Event()
+
+    def configure(self, interval, min_interval, max_interval):
+        """Apply new interval bounds, the current deadline stays as it is."""
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.interval = min(max(interval, min_interval), max_interval)
+
+    def wake(self):
+        self._wake.set()
+
+    async def wait(self):
+        """Sleep until the next deadline or until `wake()` is called."""
+        timeout = self.deadline - time.monotonic()
+        if timeout > 0 and not self._wake.is_set():
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+        self._wake.clear()
+
+    def record_cycle(self, activity, throttled):
+        """Adapt the interval to the last cycle and schedule the next deadline.
+
+        `activity` is the number of new or near-threshold offers the cycle saw,
+        `throttled` is True if the API answered 429/5xx or the search failed.
+        """
+        if throttled:
+            factor = THROTTLE_BACKOFF_FACTOR
+        elif activity:
+            factor = SPEEDUP_FACTOR
+        else:
+            factor = QUIET_BACKOFF_FACTOR
+        interval = min(max(self.interval * factor, self.min_interval), self.max_interval)
+        if interval != self.interval:
+            logging.info(f"Search interval changed from {self.interval:.1f}s to {interval:.1f}s ({'throttled' if throttled else f'{activity} active offers' if activity else 'quiet'}).")
+        self.interval = interval
+        self.deadline = time.monotonic() + interval * (1 + random.uniform(-self.jitter, self.jitter))
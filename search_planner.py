@@ -0,0 +1,94 @@
+import copy
+
+# Constants
+SEARCH_MAX_TIERS = 2  # max number of rate tiers
+SEARCH_GPU_COUNTS = (1, 2, 4, 8)  # num_gpus bucket bounds, offers above the last bound get their own query
+# Every (tier, num_gpus bucket) pair is one query, run as its own concurrent search shard,
+# so the shard count is at most SEARCH_MAX_TIERS x (len(SEARCH_GPU_COUNTS) + 1).
+DPH_EPSILON = 1e-6  # keeps float rounding from dropping an offer priced exactly at the limit
+
+
+def max_shards(max_tiers=SEARCH_MAX_TIERS, gpu_counts=SEARCH_GPU_COUNTS):
+    """Most queries `plan_search_queries` can return, whatever the rate table."""
+    return max_tiers * (len(set(gpu_counts)) + 1)
+
+
+def rate_tiers(gpu_dph_rates, max_tiers=SEARCH_MAX_TIERS):
+    """Group GPU models into at most `max_tiers` rate tiers.
+
+    Each tier is searched with the rate of its most expensive model as ceiling, so
+    the split minimises the summed relative slack (ceiling / rate - 1) over all models.
+    Returns a list of (ceiling, [gpu models]) sorted from cheapest to most expensive tier.
+    """
+    models = sorted(gpu_dph_rates, key=lambda gpu_model: gpu_dph_rates[gpu_model])
+    rates = [gpu_dph_rates[gpu_model] for gpu_model in models]
+    count = len(models)
+    if count == 0:
+        return []
+
+    def slack(start, end):
+        ceiling = rates[end - 1]
+        return sum(ceiling / rate - 1 if rate > 0 else 0 for rate in rates[start:end])
+
+    # best[tiers][end] = (cost, start of the last tier) for the first `end` models
+    best = [{0: (0.0, 0)}]
+    for tiers in range(1, min(max_tiers, count) + 1):
+        row = {}
+        for end in range(tiers, count + 1):
+            row[end] = min((best[tiers - 1][start][0] + slack(start, end), start)
+                           for start in range(tiers - 1, end) if start in best[tiers - 1])
+        best.append(row)
+    tier_count = min(range(1, len(best)), key=lambda tiers: best[tiers][count][0])
+
+    tiers = []
+    end = count
+    for level in range(tier_count, 0, -1):
+        start = best[level][end][1]
+        tiers.append((rates[end - 1], models[start:end]))
+        end = start
+    return tiers[::-1]
+
+
+def _tighten(criteria, field, op, value):
+    condition = dict(criteria.get(field) or {})
+    if op in condition:
+        value = min(condition[op], value) if op in ("lte", "lt") else max(condition[op], value)
+    condition[op] = value
+    criteria[field] = condition
+
+
+def plan_search_queries(search_criteria, gpu_dph_rates, max_tiers=SEARCH_MAX_TIERS, gpu_counts=SEARCH_GPU_COUNTS, margin=0.0):
+    """Compile the per-GPU rate table into server-side bundle queries.
+
+    The bundles API can only filter on dph_total, so each rate tier is split into
+    num_gpus buckets with a dph_total ceiling of tier rate x bucket size. The
+    per-GPU rate check still runs on the results, the queries only make sure the
+    market is not downloaded in full. `margin` widens every ceiling, so offers
+    priced just above their rate still reach the near-threshold activity count.
+    Returns a list of (label, criteria) tuples.
+    """
+    queries = []
+    bounds = sorted(set(gpu_counts))
+    allowed_models = (search_criteria.get("gpu_name") or {}).get("in")
+    for ceiling, tier_models in rate_tiers(gpu_dph_rates, max_tiers):
+        if allowed_models is not None:
+            tier_models = [gpu_model for gpu_model in tier_models if gpu_model in allowed_models]
+            if not tier_models:
+                continue
+            ceiling = max(gpu_dph_rates[gpu_model] for gpu_model in tier_models)
+        lower = 1
+        for upper in bounds + [None]:
+            criteria = copy.deepcopy(search_criteria)
+            criteria["gpu_name"] = {"in": tier_models}
+            _tighten(criteria, "num_gpus", "gte", lower)
+            if upper is not None:
+                _tighten(criteria, "num_gpus", "lte", upper)
+                _tighten(criteria, "dph_total", "lte", round(ceiling * (1 + margin) * upper + DPH_EPSILON, 6))
+                label = f"<= {ceiling}/GPU, {lower}-{upper} GPUs"
+            else:
+                label = f"<= {ceiling}/GPU, {lower}+ GPUs"
+            queries.append((label, criteria))
+            if upper is None:
+                break
+            lower = upper + 1
+    return queries
@@ -0,0 +1,51 @@
+class SlotLedger:
+    """Order slots per profile, so max_orders holds for instances in flight and not only for accepted ones.
+
+    A slot is reserved (pending) when an order is about to be sent, confirmed
+    (active) when the monitor accepts the instance, and released when the order
+    fails or the instance is destroyed. Every method runs without awaiting, so
+    updates are atomic on the event loop.
+    """
+
+    def __init__(self, limits):
+        self.limits = dict(limits)
+        self.pending = {name: 0 for name in self.limits}
+        self.active = {name: 0 for name in self.limits}
+
+    def set_limits(self, limits):
+        """Change the limits in place, keeping every count. Profiles missing from `limits` take no new orders."""
+        for name in self.limits:
+            if name not in limits:
+                self.limits[name] = 0
+        for name, limit in limits.items():
+            self.limits[name] = limit
+            self.pending.setdefault(name, 0)
+            self.active.setdefault(name, 0)
+
+    def available(self, name):
+        return self.limits[name] - self.pending[name] - self.active[name]
+
+    def reserve(self, name):
+        """Take a pending slot. Returns False if the profile has none left."""
+        if self.available(name) <= 0:
+            return False
+        self.pending[name] += 1
+        return True
+
+    def confirm(self, name):
+        """The instance behind a pending slot was accepted."""
+        self.pending[name] -= 1
+        self.active[name] += 1
+
+    def release(self, name, active=False):
+        """Free a pending slot (order failed or instance destroyed before acceptance), or an active one with `active`."""
+        if active:
+            self.active[name] -= 1
+        else:
+            self.pending[name] -= 1
+
+    def full(self, name):
+        return self.active[name] >= self.limits[name]
+
+    def summary(self):
+        return ", ".join(f"{name} {self.active[name]}+{self.pending[name]}/{limit}" for name, limit in self.limits.items())
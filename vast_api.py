@@ -0,0 +1,152 @@
+import asyncio
+import contextlib
+import logging
+import os
+import time
+
+import aiohttp
+
+import json_codec
+from rate_limiter import RATE_BURST, RATE_LIMIT, RateLimiter
+
+# Constants
+API_BASE_URL = "https://console.vast.ai/api/v0"
+DEFAULT_HEADERS = {'Accept': 'application/json', 'Accept-Encoding': 'gzip'}
+JSON_HEADERS = {'Content-Type': 'application/json'}  # for bodies passed as pre-encoded `data=` bytes
+POOL_SIZE = 10  # minimum keep-alive connections kept open to console.vast.ai, the engine sizes the pool from its shard count
+# (connect, total) timeouts in seconds, per endpoint
+TIMEOUTS = {
+    "root": (5, 10),
+    "search": (5, 30),
+    "order": (5, 15),
+    "instance": (5, 15),
+    "destroy": (5, 15),
+}
+RECORD_ENDPOINTS = ("search", "instance")  # response bodies kept by the payload recorder, for bench_json.py
+RECORD_MAX_FILES = 20  # per endpoint and run
+
+_session = None
+limiter = RateLimiter()
+_record_dir = None
+_recorded = {}
+
+
+class RequestError(Exception):
+    """Raised when a request could not be completed (connection error or timeout)."""
+
+
+class Response:
+    """Fully read API response, so callers never hold on to a pooled connection."""
+
+    def __init__(self, status_code, body, headers):
+        self.status_code = status_code
+        self.body = body
+        self.headers = headers
+
+    @property
+    def text(self):
+        return self.body.decode('utf-8', errors='replace')
+
+    def json(self):
+        return json_codec.loads(self.body)
+
+
+def _retry_after(headers):
+    try:
+        return float(headers.get('Retry-After'))
+    except (TypeError, ValueError):
+        return None
+
+
+def _encode_json(kwargs):
+    # `json=` payloads are encoded with the configured json_codec backend instead of aiohttp's json.dumps
+    if 'json' in kwargs:
+        kwargs['data'] = json_codec.dumps(kwargs.pop('json'))
+        kwargs['headers'] = {**kwargs.get('headers', {}), **JSON_HEADERS}
+
+
+def _record(endpoint, body):
+    count = _recorded.get(endpoint, 0)
+    if count >= RECORD_MAX_FILES:
+        return
+    _recorded[endpoint] = count + 1
+    path = os.path.join(_record_dir, f"{endpoint}-{time.strftime('%Y%m%d-%H%M%S')}-{count}.json")
+    try:
+        with open(path, 'wb') as file:
+            file.write(body)
+    except OSError as e:
+        logging.error(f"Failed to record {endpoint} payload to {path}: {e}")
+
+
+async def configure(pool_size=POOL_SIZE, rate=RATE_LIMIT, burst=RATE_BURST, record_dir=None):
+    """Create the shared session with a connection pool of `pool_size` connections and a `rate` req/s limit.
+
+    With `record_dir` set, successful search and instance responses are saved there for bench_json.py.
+    """
+    global _session, limiter, _record_dir
+    await close()
+    limiter = RateLimiter(rate, burst)
+    _record_dir = record_dir
+    if record_dir:
+        os.makedirs(record_dir, exist_ok=True)
+    connector = aiohttp.TCPConnector(limit=pool_size, ttl_dns_cache=300)
+    _session = aiohttp.ClientSession(headers=DEFAULT_HEADERS, connector=connector)
+    return _session
+
+
+async def close():
+    global _session
+    if _session is not None:
+        await _session.close()
+        _session = None
+
+
+async def request(method, endpoint, path, **kwargs):
+    """Send a request through the shared session and rate limiter using the timeout defined for `endpoint`."""
+    if _session is None:
+        await configure()
+    await limiter.acquire(endpoint)
+    connect_timeout, total_timeout = TIMEOUTS[endpoint]
+    kwargs.setdefault('timeout', aiohttp.ClientTimeout(total=total_timeout, connect=connect_timeout))
+    _encode_json(kwargs)
+    try:
+        async with _session.request(method, f"{API_BASE_URL}{path}", **kwargs) as response:
+            body = await response.read()
+            if response.status in (429, 503):
+                limiter.throttle(_retry_after(response.headers))
+            if _record_dir and response.status == 200 and endpoint in RECORD_ENDPOINTS:
+                _record(endpoint, body)
+            return Response(response.status, body, response.headers)
+    except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+        raise RequestError(f"{method} {path.split('?')[0]} failed: {e!r}") from e
+
+
+@contextlib.asynccontextmanager
+async def stream(method, endpoint, path, **kwargs):
+    """Like `request`, but yields the open aiohttp response so the body can be read chunk by chunk."""
+    if _session is None:
+        await configure()
+    await limiter.acquire(endpoint)
+    connect_timeout, total_timeout = TIMEOUTS[endpoint]
+    kwargs.setdefault('timeout', aiohttp.ClientTimeout(total=total_timeout, connect=connect_timeout))
+    _encode_json(kwargs)
+    try:
+        async with _session.request(method, f"{API_BASE_URL}{path}", **kwargs) as response:
+            if response.status in (429, 503):
+                limiter.throttle(_retry_after(response.headers))
+            yield response
+    except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+        raise RequestError(f"{method} {path.split('?')[0]} failed: {e!r}") from e
+
+
+async def warm_up():
+    """Open the first pooled connection (DNS, TCP, TLS) and check that the API answers."""
+    try:
+        response = await request("GET", "root", "/")
+        if response.status_code == 200:
+            logging.info("Connection with API established and working fine.")
+            return True
+        logging.error(f"Error connecting to API. Status code: {response.status_code}. Response: {response.text}")
+    except RequestError as e:
+        logging.error(f"Error connecting to API: {e}")
+    return False